@@ -0,0 +1,89 @@
+"""
+Compare parse throughput of the pydantic API models against the LiteModel ones.
+
+Usage: PYTHONPATH=src python scripts/benchmark_models.py --items 100000
+"""
+import argparse
+import json
+import os
+import time
+
+from agent.models import (
+    AlbumModel,
+    DirectionsModel,
+    LiteAlbumModel,
+    LiteDirectionsModel,
+    LiteMediaItemModel,
+    MediaItemModel,
+)
+
+SAMPLE_DIRECTIONS = os.path.join(
+    os.path.dirname(__file__), "../tests/agent/samples/directions_response.json"
+)
+
+
+def media_item(i: int) -> dict:
+    return {
+        "id": f"AF1Qip{i:012d}",
+        "productUrl": f"https://photos.google.com/lr/photo/AF1Qip{i:012d}",
+        "baseUrl": f"https://lh3.googleusercontent.com/lr/AF1Qip{i:012d}",
+        "mimeType": "image/jpeg",
+        "mediaMetadata": {
+            "createTime": "2024-05-01T10:00:00Z",
+            "width": "4032",
+            "height": "3024",
+            "photo": {"cameraMake": "Google", "cameraModel": "Pixel 8"},
+        },
+        "filename": f"PXL_{i:08d}.jpg",
+    }
+
+
+def album(i: int) -> dict:
+    return {
+        "id": f"album{i}",
+        "title": f"Album {i}",
+        "productUrl": f"https://photos.google.com/lr/album/{i}",
+        "mediaItemsCount": "120",
+        "coverPhotoBaseUrl": f"https://lh3.googleusercontent.com/lr/{i}",
+        "coverPhotoMediaItemId": f"cover{i}",
+    }
+
+
+def measure(model, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        model.parse_obj(item)
+    return time.perf_counter() - start
+
+
+def main(args):
+    with open(SAMPLE_DIRECTIONS, "r") as f:
+        directions = json.load(f)
+
+    cases = [
+        ("media item", MediaItemModel, LiteMediaItemModel, [media_item(i) for i in range(args.items)]),
+        ("album", AlbumModel, LiteAlbumModel, [album(i) for i in range(args.items)]),
+        ("directions", DirectionsModel, LiteDirectionsModel, [directions] * max(1, args.items // 100)),
+    ]
+
+    print(f"{'model':>12} {'count':>8} {'pydantic us/item':>17} {'lite us/item':>13} {'speedup':>8}")
+    for name, model, lite, items in cases:
+        pydantic_time = measure(model, items)
+        lite_time = measure(lite, items)
+        print(f"{name:>12} {len(items):>8} {pydantic_time / len(items) * 1e6:>17.2f} "
+              f"{lite_time / len(items) * 1e6:>13.2f} {pydantic_time / lite_time:>7.1f}x")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark API model parsing.")
+    parser.add_argument(
+        "--items",
+        type=int,
+        default=100000,
+        help="Number of media items and albums to parse (default: 100000)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
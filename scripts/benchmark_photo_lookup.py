@@ -0,0 +1,68 @@
+"""
+Compare resolving photo sidecars with a glob per sidecar against a single
+scandir index of the folder.
+
+Usage: PYTHONPATH=. python scripts/benchmark_photo_lookup.py --sizes 500 1000 2000 4000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from src.backup import Photo, scan_media_files
+
+
+def create_folder(root: str, size: int):
+    for i in range(size):
+        filepath = os.path.join(root, f"{i:06d}_IMG.jpg")
+        with open(filepath, "wb") as f:
+            f.write(b"\0")
+        with open(filepath[:-len("jpg")] + "json", "w") as f:
+            json.dump({"id": str(i), "filename": f"{i:06d}_IMG.jpg"}, f)
+
+
+def load_with_glob(root: str):
+    for name in os.listdir(root):
+        if name.endswith(".json"):
+            Photo.from_metadata_path(os.path.join(root, name))
+
+
+def load_with_index(root: str):
+    files_by_stem = scan_media_files(root)
+    for name in os.listdir(root):
+        if name.endswith(".json"):
+            Photo.from_metadata_path(os.path.join(root, name), files_by_stem)
+
+
+def main(args):
+    print(f"{'photos':>8} {'glob (s)':>10} {'index (s)':>10} {'speedup':>8}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as root:
+            create_folder(root, size)
+
+            start = time.perf_counter()
+            load_with_glob(root)
+            glob_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            load_with_index(root)
+            index_time = time.perf_counter() - start
+
+        print(f"{size:>8} {glob_time:>10.3f} {index_time:>10.3f} {glob_time / index_time:>7.1f}x")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark photo sidecar lookup.")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[500, 1000, 2000, 4000],
+        help="Number of photos in the folder for each run",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -1,30 +1,15 @@
-import polyline
-import math
-import time
 import os
 import argparse
 import typing as t
 import csv
 
-from agent.maps import GoogleMapsClient
+from agent.maps import STREETVIEW_CACHE_PATH, GoogleMapsClient
+from agent.ratelimit import TokenBucket
+from agent.route import bearings, interpolate, resample
+from agent.streetview import StreetViewDownloader, StreetViewFrame, StreetViewManifest
+from agent.streetview_cache import StreetViewCache
 
 
-def get_directions(client: GoogleMapsClient, origin: str, destination: str) -> t.List[t.Tuple[float, float]]:
-    """
-    Use Google Maps API to get the route between origin and destination.
-    However, the route only contains the turn nodes, not the intermediate points.
-    So we choose another way to get the route points.
-    """
-    directions = client.get_directions(origin, destination)
-
-    if not directions.routes:
-        print("No routes found.")
-        return
-
-    polyline_str = directions.routes[0].overview_polyline.points
-    points = polyline.decode(polyline_str)
-    return points
-
 def load_route_points(file_path: str) -> t.List[t.Tuple[float, float]]:
     """
     Load route points from a file.
@@ -37,42 +22,21 @@ def load_route_points(file_path: str) -> t.List[t.Tuple[float, float]]:
             points.append((float(row[0]), float(row[1])))
     return points
 
-def interplate_points(points: t.List[t.Tuple[float, float]], num_points: int) -> t.List[t.Tuple[float, float]]:
-    """
-    Interpolate points to get a smoother route.
-    """
-    interpolated_points = []
-    for i in range(len(points) - 1):
-        lat1, lng1 = points[i]
-        lat2, lng2 = points[i + 1]
-        for j in range(num_points):
-            lat = lat1 + (lat2 - lat1) * j / num_points
-            lng = lng1 + (lng2 - lng1) * j / num_points
-            interpolated_points.append((lat, lng))
-    return interpolated_points
-
-def calculate_bearing(lat1, lon1, lat2, lon2):
-    """
-    Calculate the bearing between two points on the Earth specified by latitude and longitude.
-    """
-    d_lon = math.radians(lon2 - lon1)
-    lat1 = math.radians(lat1)
-    lat2 = math.radians(lat2)
-    x = math.sin(d_lon) * math.cos(lat2)
-    y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(
-        d_lon
-    )
-    bearing = math.atan2(x, y)
-    bearing = math.degrees(bearing)
-    return (bearing + 360) % 360
-
-
 def main(args):
     download_folder = "streetview_images"
     if not os.path.exists(download_folder):
         os.makedirs(download_folder)
 
-    client = GoogleMapsClient()
+    streetview_cache = None
+    if args.reuse > 0:
+        streetview_cache = StreetViewCache(STREETVIEW_CACHE_PATH, max_distance=args.reuse)
+    rate_limit = TokenBucket(args.qps)
+    client = GoogleMapsClient(
+        cache=True,
+        streetview_cache=streetview_cache,
+        rate_limit=rate_limit,
+        pool_maxsize=args.workers,
+    )
     origin = args.org
     destination = args.dst
     samples = args.sample
@@ -81,8 +45,7 @@ def main(args):
     # Get route points
     points = []
     if origin and destination:
-        # points = get_directions(client, origin, destination)
-        ...
+        points = client.get_route_points(origin, destination)
     elif route_file:
         points = load_route_points(route_file)
 
@@ -90,34 +53,71 @@ def main(args):
         print("No route points found.")
         return
 
-    points = interplate_points(points, 2)  # Interpolate points to get a smoother route
     print(f"Loaded {len(points)} route points.")
-
-    sampled_points = points[::samples]  # Sample every N points
+    if args.spacing:
+        # Evenly spaced frames along the route
+        sampled_points = resample(points, args.spacing)
+    else:
+        points = interpolate(points, 2)  # Interpolate points to get a smoother route
+        sampled_points = points[::samples]  # Sample every N points
     print(f"Sampled {len(sampled_points)} points from the route.")
 
-    print('Are you sure you want to download street view images? (y/n)')
-    confirm = input().strip().lower()
-    if confirm != 'y':
-        print("Aborting...")
-        return
+    if not args.yes:
+        print('Are you sure you want to download street view images? (y/n)')
+        confirm = input().strip().lower()
+        if confirm != 'y':
+            print("Aborting...")
+            return
 
     print("Starting to download street view images...")
 
-    for i in range(len(sampled_points) - 1):
-        lat1, lng1 = sampled_points[i]
-        lat2, lng2 = sampled_points[i + 1]
-        heading = calculate_bearing(lat1, lng1, lat2, lng2)
-        image = client.download_streetview_image(lat1, lng1, heading)
+    headings = bearings(sampled_points)
+    frames = [
+        StreetViewFrame(i, float(lat), float(lng), float(heading))
+        for i, ((lat, lng), heading) in enumerate(zip(sampled_points[:-1], headings))
+    ]
+
+    # Shard by frame index, every machine plans the same route
+    total = len(frames)
+    end = min(args.end, total) if args.end is not None else total
+    frames = [frame for frame in frames if args.start <= frame.index < end]
+    sharded = args.start > 0 or end < total
+    manifest_name = f"manifest_{args.start}_{end}.jsonl" if sharded else "manifest.jsonl"
+    manifest = StreetViewManifest(download_folder, manifest_name)
+    print(f"Frames {args.start} to {end}: {len(frames)} to check.")
+
+    def progress(frame, stats):
+        print(f"Downloaded: {frame.filename} Heading: {int(frame.heading)} degrees ({stats})")
+
+    downloader = StreetViewDownloader(
+        client, download_folder, max_workers=args.workers, manifest=manifest,
+        verify=args.verify, archive=not args.no_archive,
+    )
+    if args.video:
+        # Imported here, OpenCV is only needed to encode videos
+        from agent.video import decode_frame, write_video
+
+        # Frames are decoded on the workers and encoded in order as they arrive
+        images = downloader.iter_images(
+            frames, transform=lambda image, frame: decode_frame(image, frame.filename)
+        )
+
+        def video_frames():
+            for frame, image in images:
+                progress(frame, downloader.stats)
+                yield image
 
-        filename = f"streetview_{i:03d}_{lat1:.5f}_{lng1:.5f}.jpg"
-        filepath = os.path.join(download_folder, filename)
-        with open(filepath, "wb") as f:
-            f.write(image)
-        print(f"Downloaded: {filename} Heading: {int(heading)} degrees")
+        count = write_video(video_frames(), args.video, args.fps)
+        print(f"Wrote {count} frames to {args.video}")
+    else:
+        downloader.download(frames, progress)
+    manifest.close()
+    client.close()
 
-        # Sleep for a while to avoid hitting the API rate limit
-        time.sleep(1)
+    stats = downloader.stats
+    print(f"Finished {stats.done} frames in {stats.elapsed:.1f}s "
+          f"(skipped: {stats.skipped}, failed: {stats.failed}), "
+          f"{rate_limit.acquired} requests at {rate_limit.achieved_rate:.2f} QPS")
 
 
 def parse_args() -> argparse.Namespace:
@@ -140,12 +140,76 @@ def parse_args() -> argparse.Namespace:
         default=10,
         help="Sample every N points from the route (default: 10)",
     )
+    parser.add_argument(
+        "--spacing",
+        type=float,
+        default=None,
+        help="Sample a point every N metres along the route instead of every N points",
+    )
     parser.add_argument(
         "--route",
         type=str,
         default="route_points.csv",
         help="File path to save the route points (default: route_points.csv)",
     )
+    parser.add_argument(
+        "--reuse",
+        type=float,
+        default=4.0,
+        help="Reuse cached frames within this distance in metres, 0 to disable (default: 4)",
+    )
+    parser.add_argument(
+        "--qps",
+        type=float,
+        default=10,
+        help="Max street view requests per second, 0 for no limit (default: 10)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of concurrent downloads (default: 8)",
+    )
+    parser.add_argument(
+        "--video",
+        type=str,
+        default=None,
+        help="Also encode the frames into this video as they are downloaded",
+    )
+    parser.add_argument(
+        "--fps",
+        type=float,
+        default=2,
+        help="Frames per second of the video (default: 2)",
+    )
+    parser.add_argument(
+        "--no_archive",
+        action="store_true",
+        help="With --video, keep the downloaded images in memory only",
+    )
+    parser.add_argument(
+        "--start",
+        type=int,
+        default=0,
+        help="First frame index of this shard (default: 0)",
+    )
+    parser.add_argument(
+        "--end",
+        type=int,
+        default=None,
+        help="Frame index where this shard stops, exclusive (default: end of the route)",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check the sha256 of already downloaded frames before skipping them",
+    )
+    parser.add_argument(
+        "-y",
+        "--yes",
+        action="store_true",
+        help="Don't ask for confirmation",
+    )
     return parser.parse_args()
 
 
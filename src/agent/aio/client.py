@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+import asyncio
+import io
+import json
+import typing as t
+
+import aiohttp
+
+from ..client import HttpClient, HttpError, GoogleCredentialMixin
+
+
+class AsyncHttpClient:
+    """
+    Async counterpart of HttpClient. All requests share one aiohttp session and
+    at most `max_concurrency` of them are in flight at the same time.
+
+    Args:
+        - max_concurrency: max requests in flight across all hosts
+        - limit_per_host: max open connections per host
+        - timeout: total timeout in seconds of a single request. Streamed
+          downloads have no total limit, only `timeout` between two reads
+        - max_retries: retries on connection errors, 429 and 5xx responses
+        - backoff_factor: exponential backoff between retries, Retry-After wins if present
+    """
+
+    retry_status = HttpClient.retry_status
+
+    def __init__(self,
+                 max_concurrency: int = 10,
+                 limit_per_host: int = 10,
+                 timeout: float = 60,
+                 max_retries: int = 3,
+                 backoff_factor: float = 0.5) -> None:
+        self.max_concurrency = max_concurrency
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        # A large video may take longer than `timeout`, as long as data keeps coming
+        self.stream_timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=timeout, sock_read=timeout
+        )
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        self._session: t.Optional[aiohttp.ClientSession] = None
+        self._semaphore: t.Optional[asyncio.Semaphore] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # The session has to be created inside the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency, limit_per_host=self.limit_per_host
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _retry_delay(self, attempt: int, headers) -> float:
+        retry_after = headers.get("Retry-After") if headers else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_factor * (2 ** attempt)
+
+    async def _request(self,
+                       method: str,
+                       url: str,
+                       title: str,
+                       fd: t.Optional[io.BufferedWriter] = None,
+                       chunk_size: int = 1 << 20,
+                       **kwargs) -> bytes:
+        """
+        Send a request and return the response body. Retry on 429/5xx and
+        connection errors, raise HttpError like HttpClient otherwise.
+        If `fd` is given, the body is streamed into it and b"" is returned. A
+        stream cut off midway is only retried if `fd` can be rewound.
+        """
+        session = self.session
+        if fd is not None:
+            kwargs.setdefault("timeout", self.stream_timeout)
+            start = fd.tell() if fd.seekable() else None
+        attempt = 0
+        written = 0
+        while True:
+            async with self._semaphore:
+                try:
+                    async with session.request(method, url, **kwargs) as ret:
+                        if ret.status in self.retry_status and attempt < self.max_retries:
+                            delay = self._retry_delay(attempt, ret.headers)
+                        elif ret.status >= 400:
+                            text = await ret.text()
+                            raise HttpError(
+                                HttpClient._error_message(title, ret.status, text),
+                                ret.status,
+                            )
+                        elif fd is not None:
+                            async for chunk in ret.content.iter_chunked(chunk_size):
+                                written += fd.write(chunk)
+                            return b""
+                        else:
+                            return await ret.read()
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt >= self.max_retries or (written and start is None):
+                        raise
+                    if written:
+                        # Drop the partial body, the retry writes it again from the start
+                        fd.seek(start)
+                        fd.truncate()
+                        written = 0
+                    delay = self._retry_delay(attempt, None)
+
+            # Sleep outside of the semaphore so other requests can proceed
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _get_json(self, url: str, title: str, **kwargs) -> dict:
+        return json.loads(await self._request("GET", url, title, **kwargs))
+
+    async def _post_json(self, url: str, title: str, **kwargs) -> dict:
+        return json.loads(await self._request("POST", url, title, **kwargs))
+
+
+class AsyncGoogleAPIClient(GoogleCredentialMixin, AsyncHttpClient):
+    def __init__(self, scopes: list, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._init_creds(scopes)
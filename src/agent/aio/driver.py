@@ -0,0 +1,9 @@
+from .client import AsyncGoogleAPIClient
+
+
+class AsyncGoogleDriverClient(AsyncGoogleAPIClient):
+    async def get_metadata(self, file_id):
+        url = f"https://www.googleapis.com/drive/v2/files/{file_id}"
+        return await self._get_json(
+            url, "Error occurred when getting file metadata", headers=self.headers
+        )
@@ -0,0 +1,75 @@
+import typing as t
+
+from ..maps import load_api_key
+from ..models import DirectionsModel, LazyDirectionsModel, LiteDirectionsModel
+from .client import AsyncHttpClient
+
+
+class AsyncGoogleMapsClient(AsyncHttpClient):
+    def __init__(self, lite_models: bool = False, **kwargs):
+        """
+        Args:
+            - lite_models: parse responses into validation-free LiteModel classes
+        """
+        super().__init__(**kwargs)
+        self.api_key = load_api_key()
+        self.directions_model = LiteDirectionsModel if lite_models else DirectionsModel
+
+    async def get_directions(self, origin: str, destination: str, lazy: bool = False,
+                             waypoints: t.Sequence[str] = None) -> DirectionsModel:
+        """
+        Get directions from origin to destination using Google Maps API.
+        With `lazy`, nested models are only validated when accessed.
+        """
+        url = "https://maps.googleapis.com/maps/api/directions/json"
+        params = {
+            "origin": origin,
+            "destination": destination,
+            "key": self.api_key,
+        }
+        if waypoints:
+            params["waypoints"] = "|".join(waypoints)
+        response = await self._get_json(
+            url, "Error occurred when getting directions", params=params
+        )
+        model = LazyDirectionsModel if lazy else self.directions_model
+        return model.parse_obj(response)
+
+    async def search_place(self, query: str) -> dict:
+        """
+        Search for a place using text query.
+        """
+        url = "https://places.googleapis.com/v1/places:searchText"
+        params = {
+            "textQuery": query
+        }
+        headers = {
+            "X-Goog-Api-Key": self.api_key,
+            "X-Goog-FieldMask": "places.id,places.displayName,places.formattedAddress"
+        }
+        return await self._post_json(
+            url,
+            "Error occurred when getting place details",
+            headers=headers,
+            params=params,
+        )
+
+    async def download_streetview_image(self, lat: float, lng: float, heading: float) -> bytes:
+        """
+        Download a street view image from Google Maps API.
+        """
+        url = "https://maps.googleapis.com/maps/api/streetview"
+        params = {
+            "size": "640x400",
+            "location": f"{lat},{lng}",
+            "fov": 90,
+            "heading": heading,
+            "pitch": 0,
+            "key": self.api_key,
+        }
+        return await self._request(
+            "GET",
+            url,
+            "Error occurred when downloading street view image",
+            params=params,
+        )
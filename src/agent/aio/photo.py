@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import asyncio
+import typing as t
+import io
+
+from ..models import AlbumModel, MediaItemModel, LiteAlbumModel, LiteMediaItemModel
+from .client import AsyncGoogleAPIClient
+
+
+class AsyncGooglePhotoClient(AsyncGoogleAPIClient):
+    def __init__(self, scopes: list, lite_models: bool = False, **kwargs) -> None:
+        """
+        Args:
+            - lite_models: parse responses into validation-free LiteModel
+              classes instead of the pydantic models, much faster on large listings
+        """
+        super().__init__(scopes, **kwargs)
+        self.album_model = LiteAlbumModel if lite_models else AlbumModel
+        self.media_item_model = LiteMediaItemModel if lite_models else MediaItemModel
+
+    async def list_all_albums(self) -> t.List[AlbumModel]:
+        return [album async for album in self.iter_all_albums()]
+
+    def iter_all_albums(self,
+                        page_size: t.Optional[int] = None,
+                        prefetch: bool = True) -> t.AsyncIterator[AlbumModel]:
+        """
+        Yield albums page by page, prefetching the next page as a task while
+        the caller processes the current one.
+        """
+        url = "https://photoslibrary.googleapis.com/v1/albums"
+
+        async def fetch_page(page_token: t.Optional[str]) -> dict:
+            params = {}
+            if page_size:
+                params["pageSize"] = page_size
+            if page_token:
+                params["pageToken"] = page_token
+            return await self._get_json(
+                url,
+                "Error occurred when list albums",
+                headers=self.headers,
+                params=params,
+            )
+
+        return self._iter_pages(fetch_page, "albums", self.album_model, prefetch)
+
+    async def list_photo_in_albums(self, album: AlbumModel) -> t.List[MediaItemModel]:
+        return [photo async for photo in self.iter_photo_in_albums(album)]
+
+    def iter_photo_in_albums(self,
+                             album: AlbumModel,
+                             page_size: t.Optional[int] = None,
+                             prefetch: bool = True) -> t.AsyncIterator[MediaItemModel]:
+        """
+        Yield media items of the album page by page, see `iter_all_albums`
+        """
+        url = "https://photoslibrary.googleapis.com/v1/mediaItems:search"
+
+        async def fetch_page(page_token: t.Optional[str]) -> dict:
+            payload = {"albumId": album.id}
+            if page_size:
+                payload["pageSize"] = page_size
+            if page_token:
+                payload["pageToken"] = page_token
+            return await self._post_json(
+                url,
+                f"Error occurred when search photos from {album.title}",
+                headers=self.headers,
+                json=payload,
+            )
+
+        return self._iter_pages(fetch_page, "mediaItems", self.media_item_model, prefetch)
+
+    @staticmethod
+    async def _iter_pages(fetch_page: t.Callable[[t.Optional[str]], t.Awaitable[dict]],
+                          key: str,
+                          model,
+                          prefetch: bool = True) -> t.AsyncIterator:
+        next_response = None
+        try:
+            response = await fetch_page(None)
+            while response is not None:
+                next_page_token = response.get("nextPageToken")
+                if next_page_token and prefetch:
+                    next_response = asyncio.ensure_future(fetch_page(next_page_token))
+
+                for item in response.get(key, []):
+                    yield model.parse_obj(item)
+
+                if not next_page_token:
+                    response = None
+                elif next_response is not None:
+                    response = await next_response
+                    next_response = None
+                else:
+                    response = await fetch_page(next_page_token)
+        finally:
+            # The caller stopped early, drop the prefetched page
+            if next_response is not None:
+                next_response.cancel()
+
+    async def list_photo_in_many_albums(
+        self, albums: t.List[AlbumModel]
+    ) -> t.Dict[str, t.List[MediaItemModel]]:
+        """
+        List photos of many albums concurrently, keyed by album id
+        """
+        results = await asyncio.gather(
+            *(self.list_photo_in_albums(album) for album in albums)
+        )
+        return {album.id: photos for album, photos in zip(albums, results)}
+
+    async def get_photo(self, photo_id: str) -> MediaItemModel:
+        url = f"https://photoslibrary.googleapis.com/v1/mediaItems/{photo_id}"
+        response = await self._get_json(
+            url,
+            f"Error occurred when getting photo of {photo_id}",
+            headers=self.headers,
+        )
+        return self.media_item_model.parse_obj(response)
+
+    async def download_photo(self, fd: io.BufferedWriter, photo_id=None, baseUrl=None):
+        if not baseUrl:
+            photo = await self.get_photo(photo_id)
+            baseUrl = photo.baseUrl
+
+        photo_url = baseUrl + "=d"
+        await self._request(
+            "GET", photo_url, f"Failed to download photo from {photo_url}", fd=fd
+        )
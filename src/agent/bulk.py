@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+import os
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+from .client import HttpError
+from .models import MediaItemModel
+from .photo import GooglePhotoClient
+from .stats import DownloadStats
+
+# Session retry statuses for a client used by BulkDownloader, 429 is left to the throttle
+BULK_RETRY_STATUS = (500, 502, 503, 504)
+
+
+class Throttle:
+    """
+    Shared delay between requests. Grows on 429 and decays on success
+    (additive decrease, multiplicative increase).
+    """
+
+    def __init__(self, initial: float = 0.5, maximum: float = 60.0, decay: float = 0.1):
+        self.initial = initial
+        self.maximum = maximum
+        self.decay = decay
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self.delay
+        if delay > 0:
+            time.sleep(delay)
+
+    def slow_down(self):
+        with self._lock:
+            self.delay = min(self.maximum, max(self.initial, self.delay * 2))
+
+    def speed_up(self):
+        with self._lock:
+            self.delay = max(0.0, self.delay - self.decay)
+
+
+class BulkDownloader:
+    """
+    Download many media items through a worker pool.
+
+    Args:
+        - client: photo client whose pooled session is shared by the workers
+        - folder: download folder, files are named '{id}_{filename}'
+        - max_workers: number of worker threads
+        - per_host: max concurrent downloads per host
+        - max_attempts: attempts per item when throttled with 429
+
+    A client with the default session retries resends a 429 itself (see
+    `HttpClient.retry_status`), so the throttle only sees it once those retries
+    are exhausted. Create the client with `retry_status=BULK_RETRY_STATUS` to
+    slow down at the first 429.
+    """
+
+    def __init__(self,
+                 client: GooglePhotoClient,
+                 folder: str,
+                 max_workers: int = 8,
+                 per_host: int = 4,
+                 max_attempts: int = 5):
+        self.client = client
+        self.folder = folder
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.max_attempts = max_attempts
+        self.throttle = Throttle()
+
+        self._host_limits: t.Dict[str, threading.Semaphore] = {}
+        self._host_lock = threading.Lock()
+
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def get_path(self, model: MediaItemModel) -> str:
+        return os.path.join(self.folder, f"{model.id}_{model.filename}")
+
+    def download(self,
+                 items: t.Iterable[MediaItemModel],
+                 progress: t.Optional[t.Callable[[DownloadStats], None]] = None
+                 ) -> t.List[t.Tuple[MediaItemModel, str]]:
+        """
+        Download all items, skipping the ones already in the folder.
+
+        Args:
+            - items: media items, e.g. the output of `list_photo_in_albums`
+            - progress: called with the stats after every finished item
+        Return:
+            a list of tuple '(MediaItemModel, path)' in the input order, ready for
+            `BackupManager.backup_album`. Failed items are left out.
+        """
+        items = list(items)
+        self.stats = DownloadStats(len(items))
+        results: t.List[t.Optional[str]] = [None] * len(items)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._download_item, model): i
+                for i, model in enumerate(items)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    self.stats.add(failed=1)
+                    print(f"Failed to download {items[i].id}: {e}")
+                if progress:
+                    progress(self.stats)
+
+        return [(model, path) for model, path in zip(items, results) if path]
+
+    def _host_limit(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.Semaphore(self.per_host)
+            return self._host_limits[host]
+
+    def _download_item(self, model: MediaItemModel) -> str:
+        path = self.get_path(model)
+        if os.path.exists(path):
+            self.stats.add(skipped=1)
+            return path
+
+        part_path = path + ".part"
+        for attempt in range(self.max_attempts):
+            self.throttle.wait()
+            # The base url expires after a while, refresh it on retries
+            base_url = model.baseUrl if attempt == 0 else None
+            try:
+                url = base_url or self.client.get_photo(model.id).baseUrl
+                offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                with self._host_limit(url):
+                    size = self.client.download_photo_to_file(part_path, baseUrl=url)
+            except HttpError as e:
+                if e.status_code != 429 or attempt == self.max_attempts - 1:
+                    raise
+                self.throttle.slow_down()
+                self.stats.add(throttled=1)
+                continue
+
+            self.throttle.speed_up()
+            os.replace(part_path, path)
+            self.stats.add(done=1, bytes=size - offset)
+            return path
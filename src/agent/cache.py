@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+
+def make_key(namespace: str, params: dict, exclude: t.Iterable[str] = ("key",)) -> str:
+    """
+    Cache key of a request. Parameters are normalized (sorted, stripped,
+    integral floats as int) and credentials are left out of the key.
+    """
+    normalized = {}
+    for name, value in params.items():
+        if name in exclude:
+            continue
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        elif isinstance(value, str):
+            value = value.strip()
+        normalized[name] = value
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class Cache:
+    """
+    Bytes cache interface used by the API clients
+    """
+
+    def get(self, key: str) -> t.Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: t.Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryCache(Cache):
+    """
+    In-memory LRU cache bounded by item count and total bytes
+
+    Args:
+        - max_items: max entries kept
+        - max_bytes: max total size of the values
+        - ttl: default time to live in seconds, None keeps entries until evicted
+    """
+
+    def __init__(self, max_items: int = 1024, max_bytes: int = 256 << 20,
+                 ttl: t.Optional[float] = None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._items: "OrderedDict[str, t.Tuple[bytes, t.Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> t.Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.time():
+                self._pop(key)
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: t.Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._items:
+                self._pop(key)
+            if len(value) > self.max_bytes:
+                return
+            self._items[key] = (value, expires)
+            self.size += len(value)
+            while len(self._items) > self.max_items or self.size > self.max_bytes:
+                self._pop(next(iter(self._items)))
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._items:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def _pop(self, key: str):
+        value, _ = self._items.pop(key)
+        self.size -= len(value)
+
+
+class SQLiteCache(Cache):
+    """
+    On-disk cache in a single SQLite file, shared across runs. Entries expire
+    after their ttl and the least recently used ones are evicted beyond max_bytes.
+
+    Args:
+        - path: SQLite file
+        - max_bytes: max total size of the values
+        - ttl: default time to live in seconds, None keeps entries until evicted
+    """
+
+    _schema_ = """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1 << 30,
+                 ttl: t.Optional[float] = 30 * 24 * 3600):
+        folder = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self._schema_)
+        self.conn.commit()
+
+    def get(self, key: str) -> t.Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires = row
+            if expires is not None and expires < now:
+                self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            return bytes(value)
+
+    def set(self, key: str, value: bytes, ttl: t.Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), expires, now),
+            )
+            self._evict(now)
+            self.conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM cache")
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _evict(self, now: float):
+        self.conn.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires < ?", (now,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop the least recently used entries until the cache fits
+        rows = self.conn.execute("SELECT key, size FROM cache ORDER BY accessed")
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM cache WHERE key = ?", stale)
+
+
+class TieredCache(Cache):
+    """
+    Look up a fast cache first, then a slower persistent one, and promote hits
+    """
+
+    def __init__(self, *caches: Cache):
+        self.caches = caches
+
+    def get(self, key: str) -> t.Optional[bytes]:
+        for i, cache in enumerate(self.caches):
+            value = cache.get(key)
+            if value is not None:
+                for upper in self.caches[:i]:
+                    upper.set(key, value)
+                return value
+        return None
+
+    def set(self, key: str, value: bytes, ttl: t.Optional[float] = None):
+        for cache in self.caches:
+            cache.set(key, value, ttl)
+
+    def delete(self, key: str):
+        for cache in self.caches:
+            cache.delete(key)
+
+    def clear(self):
+        for cache in self.caches:
+            cache.clear()
+
+    def close(self):
+        for cache in self.caches:
+            cache.close()
+
+
+def default_cache(path: str, max_bytes: int = 1 << 30,
+                  ttl: t.Optional[float] = 30 * 24 * 3600) -> Cache:
+    """
+    In-memory LRU in front of an SQLite file cache
+    """
+    return TieredCache(MemoryCache(ttl=ttl), SQLiteCache(path, max_bytes=max_bytes, ttl=ttl))
@@ -1,40 +1,164 @@
 #!/usr/bin/env python3
 import os
+import json
 import requests
 import typing as t
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from google.auth.exceptions import RefreshError
 
+from .ratelimit import TokenBucket
+
 SRC_FOLDER = os.path.abspath(os.path.join(__file__, "../../.."))
 
 SECRET_PATH = os.path.join(SRC_FOLDER, ".credentials/client_secret.json")
 CREDS_PATH = os.path.join(SRC_FOLDER, ".credentials/cred.json")
 
 
+class HttpError(RuntimeError):
+    """
+    Raised when an API responds with an error status
+    """
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RateLimitedRetry(Retry):
+    """
+    Retry taking a token of the rate limit before every resend, so retries
+    count against the limit like the first attempt
+    """
+
+    def __init__(self, *args, rate_limit: TokenBucket = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limit = rate_limit
+
+    def new(self, **kwargs) -> "RateLimitedRetry":
+        retry = super().new(**kwargs)
+        retry.rate_limit = self.rate_limit
+        return retry
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.rate_limit is not None:
+            self.rate_limit.acquire()
+
+
 class HttpClient:
+    """
+    Base client owning a pooled keep-alive session shared by every request.
+
+    Args:
+        - pool_connections: number of host pools to keep
+        - pool_maxsize: max connections kept alive per host
+        - timeout: (connect, read) timeout in seconds applied to every request
+        - max_retries: retries on connection errors, 429 and 5xx responses
+        - backoff_factor: exponential backoff between retries, Retry-After wins if present
+        - retry_status: response statuses retried by the session, default to
+          429 and 5xx. Leave 429 out when the caller throttles on it itself.
+        - rate_limit: token bucket taken by every request sent, retries included
+    """
+
+    retry_status = (429, 500, 502, 503, 504)
+
+    def __init__(self,
+                 pool_connections: int = 10,
+                 pool_maxsize: int = 10,
+                 timeout: t.Union[float, t.Tuple[float, float]] = (10, 60),
+                 max_retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 retry_status: t.Sequence[int] = None,
+                 rate_limit: TokenBucket = None) -> None:
+        self.timeout = timeout
+        self.rate_limit = rate_limit
+        if retry_status is not None:
+            self.retry_status = tuple(retry_status)
+        self.session = self._create_session(
+            pool_connections, pool_maxsize, max_retries, backoff_factor
+        )
+
+    def _create_session(self,
+                        pool_connections: int,
+                        pool_maxsize: int,
+                        max_retries: int,
+                        backoff_factor: float) -> requests.Session:
+        retry = RateLimitedRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.retry_status,
+            allowed_methods=None,  # Google APIs used here are safe to retry
+            respect_retry_after_header=True,
+            raise_on_status=False,
+            rate_limit=self.rate_limit,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        if self.rate_limit is not None:
+            self.rate_limit.acquire()
+        return self.session.get(url, **kwargs)
+
+    def _post(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        if self.rate_limit is not None:
+            self.rate_limit.acquire()
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     def _raise_error(self, response: requests.Response, title):
+        raise HttpError(
+            self._error_message(title, response.status_code, response.text),
+            response.status_code,
+        )
+
+    @staticmethod
+    def _error_message(title: str, status_code: int, text: str) -> str:
         try:
-            body = response.json()
-        except requests.exceptions.JSONDecodeError:
-            body = {"code": response.status_code, "message": response.text}
-        error = body.get("error")
+            body = json.loads(text)
+        except ValueError:
+            body = {"code": status_code, "message": text}
+        error = body.get("error") if isinstance(body, dict) else None
         if error:
             code = error["code"]
             message = error["message"]
         else:
-            code = response.status_code
+            code = status_code
             message = body
 
-        format_str = f"{title}, code: {code}, message: {message}"
-        raise RuntimeError(format_str)
+        return f"{title}, code: {code}, message: {message}"
+
 
+class GoogleCredentialMixin:
+    """
+    Load OAuth credentials and build the authorization headers
+    """
 
-class GoogleAPIClient(HttpClient):
-    def __init__(self, scopes: list) -> None:
+    def _init_creds(self, scopes: list):
         self.creds = None
         try:
             self.creds = self._load_cred(scopes)
@@ -47,7 +171,6 @@ class GoogleAPIClient(HttpClient):
 
         self.authorization = f"Bearer {self.creds.token}"
         self.headers = {"Authorization": self.authorization}
-        # self.googleAPIService = build(serviceName, version, credentials=self.creds, static_discovery=False)
 
     def _load_cred(self, scopes: list):
         creds = None
@@ -68,3 +191,10 @@ class GoogleAPIClient(HttpClient):
             with open(CREDS_PATH, "w") as token:
                 token.write(creds.to_json())
         return creds
+
+
+class GoogleAPIClient(GoogleCredentialMixin, HttpClient):
+    def __init__(self, scopes: list, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._init_creds(scopes)
+        # self.googleAPIService = build(serviceName, version, credentials=self.creds, static_discovery=False)
@@ -1,21 +1,100 @@
-import requests
+import json
 import os
+import typing as t
 
+import numpy as np
+
+from agent.cache import Cache, default_cache, make_key
 from agent.client import HttpClient
-from agent.models import DirectionsModel
+from agent.models import DirectionsModel, LazyDirectionsModel, LiteDirectionsModel
+from agent.ratelimit import TokenBucket
+from agent.route import decode_polyline, dedupe
+from agent.streetview_cache import StreetViewCache
 
 
 SRC_FOLDER = os.path.abspath(os.path.join(__file__, "../../.."))
 MAP_API_KEY_PATH = os.path.join(SRC_FOLDER, ".credentials/map_api_key.txt")
+MAP_CACHE_PATH = os.path.join(SRC_FOLDER, ".cache/maps.sqlite")
+STREETVIEW_CACHE_PATH = os.path.join(SRC_FOLDER, ".cache/streetview.sqlite")
+
+
+def load_api_key(path: str = MAP_API_KEY_PATH) -> str:
+    with open(path, "r") as f:
+        return f.read().strip()
+
+
+def _directions_cacheable(content: bytes) -> bool:
+    # Quota and key errors come back as 200 with an error status
+    return json.loads(content).get("status") in ("OK", "ZERO_RESULTS", "NOT_FOUND")
+
+
+def route_points(route) -> np.ndarray:
+    """
+    Full-resolution points of a directions route, the step polylines of every
+    leg joined without the repeated endpoints. Falls back to the simplified
+    overview polyline when the steps have no polyline.
+    """
+    encoded = [
+        step["polyline"]["points"]
+        for leg in route.legs or []
+        for step in leg.steps or []
+        if (step.get("polyline") or {}).get("points")
+    ]
+    if not encoded and route.overview_polyline is not None:
+        encoded = [route.overview_polyline.points or ""]
+    if not encoded:
+        return np.empty((0, 2))
+    return dedupe(np.concatenate([decode_polyline(points) for points in encoded]))
+
 
 class GoogleMapsClient(HttpClient):
-    def __init__(self):
-        with open(MAP_API_KEY_PATH, "r") as f:
-            self.api_key = f.read().strip()
+    def __init__(self, lite_models: bool = False, cache: t.Union[Cache, bool, None] = None,
+                 streetview_cache: StreetViewCache = None,
+                 rate_limit: TokenBucket = None, **kwargs):
+        """
+        Args:
+            - lite_models: parse responses into validation-free LiteModel classes
+            - cache: response cache shared across calls and runs, True for the
+              default memory + SQLite cache at MAP_CACHE_PATH
+            - streetview_cache: spatial cache reusing street view frames of
+              nearby points and headings
+            - rate_limit: token bucket shared by the requests sent to the API,
+              one token per attempt, cache hits don't take a token
+        """
+        super().__init__(rate_limit=rate_limit, **kwargs)
+        self.api_key = load_api_key()
+        self.directions_model = LiteDirectionsModel if lite_models else DirectionsModel
+        self.cache = default_cache(MAP_CACHE_PATH) if cache is True else cache or None
+        self.streetview_cache = streetview_cache
+
+    def close(self):
+        super().close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.streetview_cache is not None:
+            self.streetview_cache.close()
 
-    def get_directions(self, origin: str, destination: str) -> DirectionsModel:
+    def _cached(self, namespace: str, params: dict, fetch: t.Callable[[], bytes],
+                cacheable: t.Callable[[bytes], bool] = None) -> bytes:
         """
-        Get directions from origin to destination using Google Maps API.
+        Return the cached response body of a request, or fetch and store it.
+        `fetch` raises on HTTP errors, `cacheable` filters out other failures.
+        """
+        if self.cache is None:
+            return fetch()
+        key = make_key(namespace, params)
+        content = self.cache.get(key)
+        if content is None:
+            content = fetch()
+            if cacheable is None or cacheable(content):
+                self.cache.set(key, content)
+        return content
+
+    def get_directions_json(self, origin: str, destination: str,
+                            waypoints: t.Sequence[str] = None) -> dict:
+        """
+        Get the raw directions response from origin to destination through
+        the optional waypoints, in order.
         """
         url = "https://maps.googleapis.com/maps/api/directions/json"
         params = {
@@ -23,12 +102,35 @@ class GoogleMapsClient(HttpClient):
             "destination": destination,
             "key": self.api_key,
         }
-        ret = requests.get(url, params=params)
+        if waypoints:
+            params["waypoints"] = "|".join(waypoints)
 
-        if not ret.ok:
-            self._raise_error(ret, "Error occurred when getting directions")
+        def fetch() -> bytes:
+            ret = self._get(url, params=params)
+            if not ret.ok:
+                self._raise_error(ret, "Error occurred when getting directions")
+            return ret.content
 
-        return DirectionsModel.parse_obj(ret.json())
+        return json.loads(self._cached("directions", params, fetch, _directions_cacheable))
+
+    def get_directions(self, origin: str, destination: str, lazy: bool = False,
+                       waypoints: t.Sequence[str] = None) -> DirectionsModel:
+        """
+        Get directions from origin to destination using Google Maps API.
+        With `lazy`, nested models are only validated when accessed.
+        """
+        model = LazyDirectionsModel if lazy else self.directions_model
+        return model.parse_obj(self.get_directions_json(origin, destination, waypoints))
+
+    def get_route_points(self, origin: str, destination: str, route: int = 0) -> np.ndarray:
+        """
+        Get the full-resolution points of a route from origin to destination as
+        an array of shape (N, 2), lat and lng. Empty when no route is found.
+        """
+        directions = self.get_directions(origin, destination, lazy=True)
+        if not directions.routes or len(directions.routes) <= route:
+            return np.empty((0, 2))
+        return route_points(directions.routes[route])
 
     def search_place(self, query: str) -> dict:
         """
@@ -42,16 +144,21 @@ class GoogleMapsClient(HttpClient):
             "X-Goog-Api-Key": self.api_key,
             "X-Goog-FieldMask": "places.id,places.displayName,places.formattedAddress"
         }
-        ret = requests.post(url, headers=headers, params=params)
 
-        if not ret.ok:
-            self._raise_error(ret, "Error occurred when getting place details")
+        def fetch() -> bytes:
+            ret = self._post(url, headers=headers, params=params)
+            if not ret.ok:
+                self._raise_error(ret, "Error occurred when getting place details")
+            return ret.content
 
-        return ret.json()
+        # The field mask changes the response, keep it in the key
+        key_params = dict(params, fieldMask=headers["X-Goog-FieldMask"])
+        return json.loads(self._cached("places", key_params, fetch))
 
     def download_streetview_image(self, lat: float, lng: float, heading: float) -> bytes:
         """
         Download a street view image from Google Maps API.
+        With a street view cache, a frame of a nearby point may be returned.
         """
         url = "https://maps.googleapis.com/maps/api/streetview"
         params = {
@@ -62,9 +169,20 @@ class GoogleMapsClient(HttpClient):
             "pitch": 0,
             "key": self.api_key,
         }
-        ret = requests.get(url, params=params)
 
-        if not ret.ok:
-            self._raise_error(ret, "Error occurred when downloading street view image")
+        def fetch() -> bytes:
+            ret = self._get(url, params=params)
+            if not ret.ok:
+                self._raise_error(ret, "Error occurred when downloading street view image")
+            return ret.content
+
+        if self.streetview_cache is None:
+            return self._cached("streetview", params, fetch)
 
-        return ret.content
\ No newline at end of file
+        variant = f"{params['size']}:{params['fov']}:{params['pitch']}"
+        image = self.streetview_cache.get(lat, lng, heading, variant)
+        if image is None:
+            # The spatial cache also answers exact repeats, don't store the frame twice
+            image = fetch()
+            self.streetview_cache.put(lat, lng, heading, image, variant)
+        return image
\ No newline at end of file
@@ -1,6 +1,7 @@
 import typing as t
 
 from pydantic import BaseModel
+from pydantic.error_wrappers import ErrorWrapper
 import pydantic
 
 
@@ -106,3 +107,165 @@ class DirectionsBaseModel(BaseModel):
 class DirectionsModel(DirectionsBaseModel, metaclass=AllOptional):
     pass
 
+
+# Lightweight models
+class LiteModel:
+    """
+    Validation-free counterpart of a pydantic model. Fields are slots and
+    `parse_obj` is generated per class, so parsing is a few dict lookups.
+    `parse_obj` and `dict` mirror the pydantic API, values are not coerced.
+    """
+    __slots__ = ()
+    __fields__: t.Tuple[str, ...] = ()
+
+    def __init__(self, **data):
+        for name in self.__fields__:
+            setattr(self, name, data.get(name))
+
+    def dict(self) -> dict:
+        return {name: _to_dict(getattr(self, name)) for name in self.__fields__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.dict() == other.dict()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__fields__)
+        return f"{type(self).__name__}({fields})"
+
+
+def _to_dict(value):
+    if isinstance(value, LiteModel):
+        return value.dict()
+    if isinstance(value, list):
+        return [_to_dict(item) for item in value]
+    return value
+
+
+_lite_models: t.Dict[type, t.Type[LiteModel]] = {}
+
+
+def lite_model(model: t.Type[BaseModel]) -> t.Type[LiteModel]:
+    """
+    Build (once) the LiteModel of a pydantic model, nested models included
+    """
+    if model in _lite_models:
+        return _lite_models[model]
+
+    fields = tuple(model.__fields__)
+    namespace = {"__slots__": fields, "__fields__": fields}
+    lite = type(f"Lite{model.__name__}", (LiteModel,), namespace)
+    _lite_models[model] = lite
+
+    # Generate parse_obj, nested models are parsed by their own LiteModel
+    globals_ = {"_new": object.__new__}
+    lines = ["def parse_obj(cls, obj):", "    self = _new(cls)", "    get = obj.get"]
+    for name, field in model.__fields__.items():
+        if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            nested = f"_{name}_model"
+            globals_[nested] = lite_model(field.type_)
+            if t.get_origin(field.outer_type_) is list:
+                parse = f"[{nested}.parse_obj(item) for item in value]"
+            else:
+                parse = f"{nested}.parse_obj(value)"
+            lines.append(f"    value = get({name!r})")
+            lines.append(f"    self.{name} = None if value is None else {parse}")
+        else:
+            lines.append(f"    self.{name} = get({name!r})")
+    lines.append("    return self")
+    exec("\n".join(lines), globals_)
+    lite.parse_obj = classmethod(globals_["parse_obj"])
+    return lite
+
+
+LiteAlbumModel = lite_model(AlbumModel)
+LiteMediaItemModel = lite_model(MediaItemModel)
+LiteDirectionsModel = lite_model(DirectionsModel)
+
+
+# Lazy models
+class LazyModel:
+    """
+    Keep the raw response and validate a field of the pydantic model only on
+    its first access. Nested models are wrapped lazily too, and dict / list of
+    dict fields (e.g. leg steps) are returned as the original JSON once their
+    shape is checked. Errors name the field path from the root, e.g.
+    'routes -> 0 -> legs'.
+    """
+    __slots__ = ("_raw", "_values", "_loc")
+    __model__: t.Type[BaseModel] = BaseModel
+
+    def __init__(self, raw: dict, loc: t.Tuple[t.Union[str, int], ...] = ()):
+        self._raw = raw
+        self._values = {}
+        self._loc = loc
+
+    @classmethod
+    def parse_obj(cls, obj: dict, loc: t.Tuple[t.Union[str, int], ...] = ()):
+        if not isinstance(obj, dict):
+            raise cls._error(pydantic.errors.DictError(), loc or ("__root__",))
+        return cls(obj, loc)
+
+    @classmethod
+    def _error(cls, exc: Exception, loc: tuple) -> pydantic.ValidationError:
+        return pydantic.ValidationError([ErrorWrapper(exc, loc=loc)], cls.__model__)
+
+    def __getattr__(self, name: str):
+        field = self.__model__.__fields__.get(name)
+        if field is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        values = self._values
+        if name in values:
+            return values[name]
+
+        value = self._raw.get(name)
+        loc = (*self._loc, name)
+        is_list = t.get_origin(field.outer_type_) is list
+        is_model = isinstance(field.type_, type) and issubclass(field.type_, BaseModel)
+        if value is None:
+            result = None
+        elif is_list and (is_model or field.type_ is dict) and not isinstance(value, list):
+            raise self._error(pydantic.errors.ListError(), loc)
+        elif is_model:
+            nested = lazy_model(field.type_)
+            if is_list:
+                result = [nested.parse_obj(item, (*loc, i)) for i, item in enumerate(value)]
+            else:
+                result = nested.parse_obj(value, loc)
+        elif field.type_ is dict:
+            for i, item in enumerate(value if is_list else [value]):
+                if not isinstance(item, dict):
+                    raise self._error(pydantic.errors.DictError(),
+                                      (*loc, i) if is_list else loc)
+            result = value
+        else:
+            result, errors = field.validate(value, {}, loc=loc, cls=self.__model__)
+            if errors:
+                raise pydantic.ValidationError([errors], self.__model__)
+
+        values[name] = result
+        return result
+
+    def dict(self) -> dict:
+        # Full validation, same output as the pydantic model
+        return self.__model__.parse_obj(self._raw).dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._raw!r})"
+
+
+_lazy_models: t.Dict[type, t.Type[LazyModel]] = {}
+
+
+def lazy_model(model: t.Type[BaseModel]) -> t.Type[LazyModel]:
+    """
+    Build (once) the LazyModel of a pydantic model
+    """
+    if model not in _lazy_models:
+        _lazy_models[model] = type(
+            f"Lazy{model.__name__}", (LazyModel,), {"__slots__": (), "__model__": model}
+        )
+    return _lazy_models[model]
+
+
+LazyDirectionsModel = lazy_model(DirectionsModel)
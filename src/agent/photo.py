@@ -1,38 +1,56 @@
 #!/usr/bin/env python3
-import requests
 import typing as t
 import io
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-from .models import AlbumModel, MediaItemModel
+from .models import AlbumModel, MediaItemModel, LiteAlbumModel, LiteMediaItemModel
 from .client import GoogleAPIClient
 
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
 
 class GooglePhotoClient(GoogleAPIClient):
+    def __init__(self, scopes: list, lite_models: bool = False, **kwargs) -> None:
+        """
+        Args:
+            - lite_models: parse responses into validation-free LiteModel
+              classes instead of the pydantic models, much faster on large listings
+        """
+        super().__init__(scopes, **kwargs)
+        self.album_model = LiteAlbumModel if lite_models else AlbumModel
+        self.media_item_model = LiteMediaItemModel if lite_models else MediaItemModel
+
     def list_all_albums(self) -> t.List[AlbumModel]:
-        url = "https://photoslibrary.googleapis.com/v1/albums"
-        ret = requests.get(url, headers=self.headers)
-        if not ret.ok:
-            self._raise_error(ret, "Error occurred when list albums")
+        return list(self.iter_all_albums())
 
-        response = ret.json()
-        albums_list = []
+    def iter_all_albums(self,
+                        page_size: t.Optional[int] = None,
+                        prefetch: bool = True) -> t.Iterator[AlbumModel]:
+        """
+        Yield albums page by page. The next page is fetched in the background
+        while the caller processes the current one if `prefetch` is set.
 
-        for album in response["albums"]:
-            albums_list.append(AlbumModel.parse_obj(album))
+        Args:
+            - page_size: albums per page, the API allows at most 50
+            - prefetch: request the next page before yielding the current one
+        """
+        url = "https://photoslibrary.googleapis.com/v1/albums"
 
-        next_page_token = response.get("nextPageToken")
-        while next_page_token:
-            params = {"pageToken": next_page_token}
-            ret = requests.get(url, headers=self.headers, params=params)
+        def fetch_page(page_token: t.Optional[str]) -> dict:
+            params = {}
+            if page_size:
+                params["pageSize"] = page_size
+            if page_token:
+                params["pageToken"] = page_token
+            ret = self._get(url, headers=self.headers, params=params)
             if not ret.ok:
-                self._raise_error(ret, "Error occurred when list the next albums")
-            response = ret.json()
-            for album in response["albums"]:
-                albums_list.append(AlbumModel.parse_obj(album))
-
-            next_page_token = response.get("nextPageToken")
+                if page_token:
+                    self._raise_error(ret, "Error occurred when list the next albums")
+                self._raise_error(ret, "Error occurred when list albums")
+            return ret.json()
 
-        return albums_list
+        return self._iter_pages(fetch_page, "albums", self.album_model, prefetch)
 
     def list_photo_in_albums(self, album: AlbumModel) -> t.List[MediaItemModel]:
         """
@@ -48,58 +66,176 @@ class GooglePhotoClient(GoogleAPIClient):
             "orderBy": string
         }
         """
-        url = "https://photoslibrary.googleapis.com/v1/mediaItems:search"
-        payload = {"albumId": album.id}
-        ret = requests.post(url, headers=self.headers, json=payload)
-
-        if not ret.ok:
-            self._raise_error(
-                ret, f"Error occurred when search photos from {album.title}"
-            )
+        return list(self.iter_photo_in_albums(album))
 
-        response = ret.json()
-        photo_list = []
-
-        for photo in response["mediaItems"]:
-            photo_list.append(MediaItemModel.parse_obj(photo))
-
-        next_page_token = response.get("nextPageToken")
-        while next_page_token:
-            next_payload = payload
-            next_payload["pageToken"] = next_page_token
-            ret = requests.post(url, headers=self.headers, json=next_payload)
+    def iter_photo_in_albums(self,
+                             album: AlbumModel,
+                             page_size: t.Optional[int] = None,
+                             prefetch: bool = True) -> t.Iterator[MediaItemModel]:
+        """
+        Yield media items of the album page by page, see `iter_all_albums`.
+        The API allows at most 100 items per page.
+        """
+        url = "https://photoslibrary.googleapis.com/v1/mediaItems:search"
 
+        def fetch_page(page_token: t.Optional[str]) -> dict:
+            payload = {"albumId": album.id}
+            if page_size:
+                payload["pageSize"] = page_size
+            if page_token:
+                payload["pageToken"] = page_token
+            ret = self._post(url, headers=self.headers, json=payload)
             if not ret.ok:
                 self._raise_error(
                     ret, f"Error occurred when search photos from {album.title}"
                 )
+            return ret.json()
 
-            response = ret.json()
-            for photo in response["mediaItems"]:
-                photo_list.append(MediaItemModel.parse_obj(photo))
-            next_page_token = response.get("nextPageToken")
+        return self._iter_pages(fetch_page, "mediaItems", self.media_item_model, prefetch)
 
-        return photo_list
+    @staticmethod
+    def _iter_pages(fetch_page: t.Callable[[t.Optional[str]], dict],
+                    key: str,
+                    model,
+                    prefetch: bool = True) -> t.Iterator:
+        """
+        Walk a paginated listing. `fetch_page` takes the page token and returns
+        the decoded response; items under `key` are parsed into `model`.
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            response = fetch_page(None)
+            while response is not None:
+                next_page_token = response.get("nextPageToken")
+                next_response = None
+                if next_page_token and prefetch:
+                    next_response = executor.submit(fetch_page, next_page_token)
+
+                for item in response.get(key, []):
+                    yield model.parse_obj(item)
+
+                if not next_page_token:
+                    response = None
+                elif next_response is not None:
+                    response = next_response.result()
+                else:
+                    response = fetch_page(next_page_token)
+
+    def get_photo(self, photo_id: str) -> MediaItemModel:
+        url = f"https://photoslibrary.googleapis.com/v1/mediaItems/{photo_id}"
+        ret = self._get(url, headers=self.headers)
+
+        if not ret.ok:
+            self._raise_error(
+                ret, f"Error occurred when getting photo of {photo_id}"
+            )
+
+        return self.media_item_model.parse_obj(ret.json())
 
-    def download_photo(self, fd: io.BufferedWriter, photo_id=None, baseUrl=None):
+    def download_photo(self,
+                       fd: io.BufferedWriter,
+                       photo_id=None,
+                       baseUrl=None,
+                       chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> int:
+        """
+        Stream the original media into `fd` chunk by chunk.
+        Return the number of bytes written.
+        """
         if not baseUrl:
-            url = f"https://photoslibrary.googleapis.com/v1/mediaItems/{photo_id}"
-            ret = requests.get(url, headers=self.headers)
+            baseUrl = self.get_photo(photo_id).baseUrl
 
+        photo_url = baseUrl + "=d"
+        with self._get(photo_url, stream=True) as ret:
             if not ret.ok:
-                self._raise_error(
-                    ret, f"Error occurred when getting photo of {photo_id}"
-                )
+                self._raise_error(ret, f"Failed to download photo from {photo_url}")
 
-            response = ret.json()
+            written = self._write_chunks(fd, ret, chunk_size)
+            expected = ret.headers.get("Content-Length")
+            if expected is not None and "Content-Encoding" not in ret.headers:
+                self._check_size(photo_url, written, int(expected))
 
-            photo = MediaItemModel.parse_obj(response)
-            baseUrl = photo.baseUrl
+        return written
 
+    def download_photo_to_file(self,
+                               path: str,
+                               photo_id=None,
+                               baseUrl=None,
+                               chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                               resume: bool = True) -> int:
+        """
+        Stream the original media into `path`. If the file already holds part
+        of the media and `resume` is set, only the missing tail is requested
+        with an HTTP Range header. Return the final file size.
+        """
+        if not baseUrl:
+            baseUrl = self.get_photo(photo_id).baseUrl
+
+        offset = os.path.getsize(path) if resume and os.path.exists(path) else 0
         photo_url = baseUrl + "=d"
-        ret = requests.get(photo_url)
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
 
-        if not ret.ok:
-            self._raise_error(ret, f"Failed to download photo from {photo_url}")
+        with self._get(photo_url, headers=headers, stream=True) as ret:
+            if ret.status_code == 416:
+                # Nothing left to fetch, the partial file is already complete
+                total = self._content_range_total(ret)
+                if total is not None:
+                    self._check_size(photo_url, offset, total)
+                return offset
 
-        fd.write(ret.content)
+            if not ret.ok:
+                self._raise_error(ret, f"Failed to download photo from {photo_url}")
+
+            # Appending a range that starts elsewhere would corrupt the file
+            restart = ret.status_code == 206 and self._content_range_start(ret) != offset
+            if not restart:
+                if ret.status_code == 206:
+                    mode = "ab"
+                    total = self._content_range_total(ret)
+                else:
+                    # The server ignored the range, start over
+                    mode = "wb"
+                    offset = 0
+                    total = ret.headers.get("Content-Length")
+                    if "Content-Encoding" in ret.headers:
+                        total = None
+                    total = int(total) if total is not None else None
+
+                with open(path, mode) as fd:
+                    written = self._write_chunks(fd, ret, chunk_size)
+
+        if restart:
+            return self.download_photo_to_file(path, baseUrl=baseUrl,
+                                               chunk_size=chunk_size, resume=False)
+
+        size = offset + written
+        if total is not None:
+            self._check_size(photo_url, size, total)
+        return size
+
+    @staticmethod
+    def _write_chunks(fd: io.BufferedWriter, response, chunk_size: int) -> int:
+        written = 0
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            fd.write(chunk)
+            written += len(chunk)
+        return written
+
+    @staticmethod
+    def _content_range_start(response) -> t.Optional[int]:
+        # Content-Range: bytes 100-199/200, None for bytes */200
+        content_range = response.headers.get("Content-Range", "")
+        start = content_range.partition(" ")[2].partition("-")[0]
+        return int(start) if start.isdigit() else None
+
+    @staticmethod
+    def _content_range_total(response) -> t.Optional[int]:
+        # Content-Range: bytes 100-199/200 or bytes */200
+        content_range = response.headers.get("Content-Range", "")
+        total = content_range.rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+
+    @staticmethod
+    def _check_size(url: str, size: int, expected: int):
+        if size != expected:
+            raise RuntimeError(
+                f"Incomplete download from {url}, got {size} of {expected} bytes"
+            )
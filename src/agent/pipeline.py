@@ -0,0 +1,37 @@
+import collections
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+T = t.TypeVar("T")
+R = t.TypeVar("R")
+
+
+def ordered_map(func: t.Callable[[T], R],
+                items: t.Iterable[T],
+                max_workers: int = 4,
+                window: int = None) -> t.Iterator[R]:
+    """
+    Map func over items on a thread pool and yield the results in input order.
+    At most `window` items are in flight, so a slow consumer bounds the memory
+    and the workers stay `window` items ahead of it.
+
+    Args:
+        - func: work of an item, should release the GIL (I/O, OpenCV, NumPy)
+        - items: input, consumed lazily
+        - max_workers: number of worker threads
+        - window: max items submitted but not yet yielded, default to 2 * max_workers
+    """
+    window = window or 2 * max_workers
+    pending: t.Deque = collections.deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Stopped early or failed, drop the work not started yet
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,129 @@
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from agent.maps import GoogleMapsClient
+from agent.models import DirectionsModel, LazyDirectionsModel
+from agent.route import decode_polyline, dedupe, encode_polyline
+
+
+class RoutePlanner:
+    """
+    Plan a route through many stops. The stops are split into segments of at
+    most `max_waypoints` intermediate waypoints, consecutive segments sharing
+    an endpoint, and the segments are requested concurrently over the client's
+    pooled session. The legs are stitched back into a single route.
+
+    Args:
+        - client: maps client, its pool should fit `max_workers` connections
+        - max_waypoints: intermediate waypoints per request, 25 for the Directions API
+        - max_workers: concurrent requests
+    """
+
+    def __init__(self, client: GoogleMapsClient, max_waypoints: int = 25, max_workers: int = 8):
+        if max_waypoints < 0:
+            raise ValueError(f"max_waypoints must not be negative, got {max_waypoints}")
+        self.client = client
+        self.max_waypoints = max_waypoints
+        self.max_workers = max_workers
+
+    def split(self, stops: t.Sequence[str]) -> t.List[t.List[str]]:
+        """
+        Split the stops into segments, the last stop of a segment is the first
+        of the next one
+        """
+        if len(stops) < 2:
+            raise ValueError("A route needs at least an origin and a destination")
+        step = self.max_waypoints + 1
+        return [list(stops[i:i + step + 1]) for i in range(0, len(stops) - 1, step)]
+
+    def plan(self, stops: t.Sequence[str], lazy: bool = False) -> DirectionsModel:
+        """
+        Get the directions through all stops, in order
+
+        Args:
+            - stops: origin, waypoints and destination
+            - lazy: parse into the lazy model, see `GoogleMapsClient.get_directions`
+        Return:
+            a directions model with one route whose legs go from stop to stop
+        """
+        segments = self.split(stops)
+
+        def request(segment: t.List[str]) -> dict:
+            return self.client.get_directions_json(segment[0], segment[-1], segment[1:-1])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            responses = list(executor.map(request, segments))
+
+        for segment, response in zip(segments, responses):
+            if response.get("status") != "OK" or not response.get("routes"):
+                raise RuntimeError(
+                    f"Error occurred when planning {segment[0]} -> {segment[-1]}: "
+                    f"{response.get('status')} {response.get('error_message', '')}".strip()
+                )
+
+        model = LazyDirectionsModel if lazy else self.client.directions_model
+        return model.parse_obj(stitch(responses))
+
+
+def stitch(responses: t.Sequence[dict]) -> dict:
+    """
+    Join directions responses of consecutive segments into one response, using
+    the first route of each
+    """
+    routes = [response["routes"][0] for response in responses]
+    geocoded = list(responses[0].get("geocoded_waypoints") or [])
+    for response in responses[1:]:
+        # The first waypoint is the previous segment's destination
+        geocoded.extend((response.get("geocoded_waypoints") or [])[1:])
+
+    legs, waypoint_order, warnings, summaries = [], [], [], []
+    for route in routes:
+        offset = len(legs)
+        if offset:
+            # The shared endpoint is an intermediate waypoint of the whole route
+            waypoint_order.append(offset - 1)
+        waypoint_order.extend(offset + i for i in route.get("waypoint_order") or [])
+        legs.extend(route.get("legs") or [])
+        for warning in route.get("warnings") or []:
+            if warning not in warnings:
+                warnings.append(warning)
+        summary = route.get("summary")
+        if summary and summary not in summaries:
+            summaries.append(summary)
+
+    overview = dedupe(np.concatenate([
+        decode_polyline((route.get("overview_polyline") or {}).get("points") or "")
+        for route in routes
+    ]))
+
+    return {
+        "geocoded_waypoints": geocoded,
+        "routes": [{
+            "bounds": _merge_bounds([route.get("bounds") for route in routes]),
+            "copyrights": routes[0].get("copyrights"),
+            "legs": legs,
+            "overview_polyline": {"points": encode_polyline(overview)},
+            "summary": ", ".join(summaries),
+            "warnings": warnings,
+            "waypoint_order": waypoint_order,
+        }],
+        "status": "OK",
+    }
+
+
+def _merge_bounds(bounds: t.List[t.Optional[dict]]) -> t.Optional[dict]:
+    bounds = [b for b in bounds if b]
+    if not bounds:
+        return None
+    return {
+        "northeast": {
+            "lat": max(b["northeast"]["lat"] for b in bounds),
+            "lng": max(b["northeast"]["lng"] for b in bounds),
+        },
+        "southwest": {
+            "lat": min(b["southwest"]["lat"] for b in bounds),
+            "lng": min(b["southwest"]["lng"] for b in bounds),
+        },
+    }
@@ -0,0 +1,48 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket, requests go out at `rate` per second on average
+    with bursts of up to `burst` requests.
+
+    Args:
+        - rate: tokens added per second, 0 or less disables the limit
+        - burst: bucket capacity, default to one second of tokens
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.acquired = 0
+        self.started = self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1):
+        """
+        Block until `tokens` are available and take them
+        """
+        while True:
+            with self._lock:
+                if self.rate <= 0:
+                    self.acquired += tokens
+                    return
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    self.acquired += tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    @property
+    def achieved_rate(self) -> float:
+        """
+        Tokens taken per second since the bucket was created
+        """
+        elapsed = time.monotonic() - self.started
+        return self.acquired / elapsed if elapsed > 0 else 0.0
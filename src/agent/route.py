@@ -0,0 +1,156 @@
+import typing as t
+
+import numpy as np
+
+EARTH_RADIUS = 6371008.8
+
+Points = t.Union[np.ndarray, t.Sequence[t.Tuple[float, float]]]
+
+
+def as_points(points: Points) -> np.ndarray:
+    """
+    Return the points as a float64 array of shape (N, 2), columns lat and lng
+    """
+    array = np.asarray(points, dtype=np.float64)
+    if array.size == 0:
+        return array.reshape(0, 2)
+    if array.ndim != 2 or array.shape[1] != 2:
+        raise ValueError(f"Expect points of shape (N, 2), got {array.shape}")
+    return array
+
+
+def haversine(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """
+    Great-circle distance in metres between arrays of coordinates in degrees
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(np.asarray(lng2) - np.asarray(lng1))
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def segment_lengths(points: Points) -> np.ndarray:
+    """
+    Length in metres of each of the N-1 segments
+    """
+    points = as_points(points)
+    return haversine(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+
+
+def cumulative_distance(points: Points) -> np.ndarray:
+    """
+    Distance in metres from the first point to each point along the route
+    """
+    lengths = segment_lengths(points)
+    distance = np.empty(len(lengths) + 1)
+    distance[0] = 0.0
+    np.cumsum(lengths, out=distance[1:])
+    return distance
+
+
+def bearings(points: Points) -> np.ndarray:
+    """
+    Initial bearing in degrees [0, 360) of each of the N-1 segments
+    """
+    points = np.radians(as_points(points))
+    lat1, lat2 = points[:-1, 0], points[1:, 0]
+    d_lng = points[1:, 1] - points[:-1, 1]
+    x = np.sin(d_lng) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(d_lng)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def interpolate(points: Points, num_points: int) -> np.ndarray:
+    """
+    Split every segment into `num_points` equal steps in degrees, the last
+    point is left out like the segments' ends
+    """
+    points = as_points(points)
+    if len(points) < 2:
+        return points[:0]
+    steps = np.arange(num_points) / num_points
+    start, delta = points[:-1], points[1:] - points[:-1]
+    return (start[:, None, :] + delta[:, None, :] * steps[None, :, None]).reshape(-1, 2)
+
+
+def resample(points: Points, spacing: float) -> np.ndarray:
+    """
+    Resample the route every `spacing` metres along its length, starting at
+    the first point. Positions are interpolated linearly within a segment.
+    """
+    if spacing <= 0:
+        raise ValueError(f"Spacing must be positive, got {spacing}")
+    points = as_points(points)
+    if len(points) < 2:
+        return points.copy()
+
+    distance = cumulative_distance(points)
+    # Repeated points have no length, np.interp needs increasing distances
+    keep = np.concatenate(([True], np.diff(distance) > 0))
+    points, distance = points[keep], distance[keep]
+
+    targets = np.arange(0.0, distance[-1] + 1e-9, spacing)
+    return np.column_stack((
+        np.interp(targets, distance, points[:, 0]),
+        np.interp(targets, distance, points[:, 1]),
+    ))
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> np.ndarray:
+    """
+    Decode an encoded polyline (Google's polyline algorithm) into an array of
+    shape (N, 2). All characters are decoded at once with array operations.
+    """
+    data = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    if data.size == 0:
+        return np.empty((0, 2))
+    if np.any((data < 0) | (data > 63)):
+        raise ValueError("Invalid character in encoded polyline")
+
+    # A value is a run of 5-bit chunks, the 0x20 bit is set on all but its last chunk
+    last = (data & 0x20) == 0
+    if not last[-1]:
+        raise ValueError("Truncated encoded polyline")
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    if len(starts) % 2:
+        raise ValueError("Encoded polyline has an odd number of values")
+    value_index = np.cumsum(last) - last
+    shifts = 5 * (np.arange(len(data)) - starts[value_index])
+    values = np.add.reduceat((data & 0x1f) << shifts, starts)
+
+    # Zigzag-encoded deltas
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision
+
+
+def dedupe(points: Points) -> np.ndarray:
+    """
+    Drop points equal to the point before them
+    """
+    points = as_points(points)
+    if len(points) < 2:
+        return points
+    keep = np.concatenate(([True], np.any(points[1:] != points[:-1], axis=1)))
+    return points[keep]
+
+
+def encode_polyline(points: Points, precision: int = 5) -> str:
+    """
+    Encode points with Google's polyline algorithm, the inverse of decode_polyline
+    """
+    points = as_points(points)
+    if len(points) == 0:
+        return ""
+    ints = np.floor(points * 10 ** precision + 0.5).astype(np.int64)
+    deltas = np.diff(ints, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    # Split each value into 5-bit chunks, low bits first, 0x20 set on all but the last
+    max_chunks = max(1, (int(values.max()).bit_length() + 4) // 5)
+    positions = np.arange(max_chunks)
+    chunks = (values[:, None] >> (5 * positions)) & 0x1f
+    counts = 1 + np.count_nonzero(values[:, None] >> (5 * positions[1:]), axis=1)
+    chunks |= np.where(positions < (counts - 1)[:, None], 0x20, 0)
+    chars = chunks[positions < counts[:, None]] + 63
+    return chars.astype(np.uint8).tobytes().decode("ascii")
@@ -0,0 +1,42 @@
+import threading
+import time
+
+
+class DownloadStats:
+    """
+    Thread-safe counters of a download job, shared by its workers
+    """
+
+    def __init__(self, total: int = 0):
+        self.total = total
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+        self.throttled = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, done=0, skipped=0, failed=0, bytes=0, throttled=0):
+        with self._lock:
+            self.done += done
+            self.skipped += skipped
+            self.failed += failed
+            self.bytes += bytes
+            self.throttled += throttled
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        finished = self.done + self.skipped + self.failed
+        return (f"{finished}/{self.total} "
+                f"(done: {self.done}, skipped: {self.skipped}, failed: {self.failed}, "
+                f"throttled: {self.throttled}) "
+                f"{self.bytes / 1e6:.1f} MB, {self.bytes_per_second / 1e6:.2f} MB/s")
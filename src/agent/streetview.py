@@ -0,0 +1,278 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agent.maps import GoogleMapsClient
+from agent.pipeline import ordered_map
+from agent.stats import DownloadStats
+
+
+class StreetViewFrame:
+    """
+    A street view image to download along a route
+
+    Attributes:
+        - index: position of the frame in the route
+        - lat, lng: camera location
+        - heading: camera heading in degrees
+    """
+
+    def __init__(self, index: int, lat: float, lng: float, heading: float):
+        self.index = index
+        self.lat = lat
+        self.lng = lng
+        self.heading = heading
+
+    @property
+    def filename(self) -> str:
+        # generate_video.py reads the location back from the name
+        return f"streetview_{self.index:03d}_{self.lat:.5f}_{self.lng:.5f}.jpg"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StreetViewManifest:
+    """
+    Append-only job log of a download folder, one json line per finished frame
+    with its index, location, heading, status, sha256, filename and time. The
+    newest line of an index wins, so a crash loses at most the frames in flight.
+
+    Sharded runs each write their own manifest file, all of them are read
+    back when resuming.
+
+    Args:
+        - folder: download folder
+        - name: manifest file written by this run
+    """
+    pattern = "manifest*.jsonl"
+
+    def __init__(self, folder: str, name: str = "manifest.jsonl"):
+        self.folder = folder
+        self.path = os.path.join(folder, name)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> t.Dict[int, dict]:
+        """
+        Return the newest record of every frame index in the folder's manifests
+        """
+        records = {}
+        for path in sorted(glob.glob(os.path.join(self.folder, self.pattern))):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Truncated last line of a killed run
+                        continue
+                    # Records without a time come from older runs
+                    previous = records.get(record["index"])
+                    if previous is None or record.get("time", 0) >= previous.get("time", 0):
+                        records[record["index"]] = record
+        return records
+
+    def record(self, frame: StreetViewFrame, status: str, sha256: str = None):
+        line = json.dumps({
+            "index": frame.index,
+            "lat": frame.lat,
+            "lng": frame.lng,
+            "heading": frame.heading,
+            "status": status,
+            "sha256": sha256,
+            "filename": frame.filename,
+            "time": time.time(),
+        })
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class StreetViewDownloader:
+    """
+    Download street view frames through a worker pool. The request rate is set
+    by the client's `rate_limit` and retries on 429/5xx by its session, so
+    the pool only has to keep enough requests in flight.
+
+    With a manifest, frames already downloaded for the same location and
+    heading are skipped and every finished frame is logged, so a rerun only
+    fetches the missing and failed ones.
+
+    Args:
+        - client: maps client whose pooled session is shared by the workers
+        - folder: download folder
+        - max_workers: number of worker threads
+        - manifest: job log of the folder
+        - verify: check the sha256 of the skipped files against the manifest
+        - archive: write the downloaded images to the folder, `iter_images` can
+          skip it to keep frames in memory only
+    """
+
+    def __init__(self,
+                 client: GoogleMapsClient,
+                 folder: str,
+                 max_workers: int = 8,
+                 manifest: StreetViewManifest = None,
+                 verify: bool = False,
+                 archive: bool = True):
+        self.client = client
+        self.folder = folder
+        self.max_workers = max_workers
+        self.manifest = manifest
+        self.verify = verify
+        self.archive = archive
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def get_path(self, frame: StreetViewFrame) -> str:
+        return os.path.join(self.folder, frame.filename)
+
+    def download(self,
+                 frames: t.Iterable[StreetViewFrame],
+                 progress: t.Optional[t.Callable[[StreetViewFrame, DownloadStats], None]] = None
+                 ) -> t.List[t.Tuple[StreetViewFrame, str]]:
+        """
+        Download all frames, each file is written as soon as its request completes.
+
+        Args:
+            - frames: frames to download
+            - progress: called with the frame and the stats after every finished frame
+        Return:
+            a list of tuple '(StreetViewFrame, path)' in the input order.
+            Failed frames are left out.
+        """
+        frames = list(frames)
+        self.stats = DownloadStats(len(frames))
+        results: t.List[t.Optional[str]] = [None] * len(frames)
+        records = self.manifest.load() if self.manifest is not None else {}
+
+        pending = []
+        for i, frame in enumerate(frames):
+            if self._is_done(frame, records.get(frame.index)):
+                results[i] = self.get_path(frame)
+                self.stats.add(skipped=1)
+            else:
+                pending.append(i)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._download_frame, frames[i]): i
+                for i in pending
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    self.stats.add(failed=1)
+                    self._record(frames[i], "failed")
+                    print(f"Failed to download frame {frames[i].index}: {e}")
+                if progress:
+                    progress(frames[i], self.stats)
+
+        return [(frame, path) for frame, path in zip(frames, results) if path]
+
+    def iter_images(self,
+                    frames: t.Iterable[StreetViewFrame],
+                    transform: t.Optional[t.Callable[[bytes, StreetViewFrame], t.Any]] = None,
+                    window: int = None) -> t.Iterator[t.Tuple[StreetViewFrame, t.Any]]:
+        """
+        Yield the image of every frame in input order as soon as it is ready,
+        e.g. to feed a video encoder while later frames are still downloading.
+        Frames already in the folder are read from the disk.
+
+        Args:
+            - frames: frames to download
+            - transform: applied to the image bytes on the worker, e.g. decoding
+            - window: max frames in flight, default to 2 * max_workers
+        Return:
+            an iterator of tuple '(StreetViewFrame, image)', image being the
+            output of transform if given. Frames failing to download or to
+            transform are left out.
+        """
+        frames = list(frames)
+        self.stats = DownloadStats(len(frames))
+        records = self.manifest.load() if self.manifest is not None else {}
+
+        def work(frame: StreetViewFrame):
+            try:
+                image = self._fetch(frame, records.get(frame.index))
+            except Exception as e:
+                self.stats.add(failed=1)
+                self._record(frame, "failed")
+                print(f"Failed to download frame {frame.index}: {e}")
+                return None
+            if transform is None:
+                return frame, image
+            try:
+                return frame, transform(image, frame)
+            except Exception as e:
+                # The download itself succeeded, keep its stats and manifest record
+                print(f"Failed to transform frame {frame.index}: {e}")
+                return None
+
+        for result in ordered_map(work, frames, self.max_workers, window):
+            if result is not None:
+                yield result
+
+    def _fetch(self, frame: StreetViewFrame, record: t.Optional[dict]) -> bytes:
+        path = self.get_path(frame)
+        if self._is_done(frame, record):
+            with open(path, "rb") as f:
+                image = f.read()
+            self.stats.add(skipped=1)
+            return image
+
+        image = self.client.download_streetview_image(frame.lat, frame.lng, frame.heading)
+        if self.archive:
+            self._save(frame, image)
+        self.stats.add(done=1, bytes=len(image))
+        return image
+
+    def _is_done(self, frame: StreetViewFrame, record: t.Optional[dict]) -> bool:
+        path = self.get_path(frame)
+        if self.manifest is None or not os.path.exists(path):
+            return False
+        if record is None:
+            # Downloaded before the manifest existed, the name pins the location
+            return True
+        if record["status"] != "done" or round(record["heading"], 3) != round(frame.heading, 3):
+            return False
+        return not self.verify or file_sha256(path) == record["sha256"]
+
+    def _record(self, frame: StreetViewFrame, status: str, sha256: str = None):
+        if self.manifest is not None:
+            self.manifest.record(frame, status, sha256)
+
+    def _save(self, frame: StreetViewFrame, image: bytes) -> str:
+        path = self.get_path(frame)
+        part_path = path + ".part"
+        with open(part_path, "wb") as f:
+            f.write(image)
+        os.replace(part_path, path)
+        self._record(frame, "done", hashlib.sha256(image).hexdigest())
+        return path
+
+    def _download_frame(self, frame: StreetViewFrame) -> str:
+        image = self.client.download_streetview_image(frame.lat, frame.lng, frame.heading)
+        path = self._save(frame, image)
+        self.stats.add(done=1, bytes=len(image))
+        return path
@@ -0,0 +1,257 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import typing as t
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS = 6371008.8
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 9) -> str:
+    """
+    Geohash of a coordinate, nearby points share a prefix
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, value_range = (lng, lng_range) if even else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            value_range[0] = mid
+        else:
+            bits = bits * 2
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = bit_count = 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> t.Tuple[float, float, float, float]:
+    """
+    Return the cell of a geohash as (lat_min, lat_max, lng_min, lng_max)
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lng_range if even else lat_range
+            mid = (value_range[0] + value_range[1]) / 2
+            if bits >> shift & 1:
+                value_range[0] = mid
+            else:
+                value_range[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def geohash_neighbors(geohash: str) -> t.List[str]:
+    """
+    Return the cell and its 8 surrounding cells
+    """
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(geohash)
+    lat, lng = (lat_min + lat_max) / 2, (lng_min + lng_max) / 2
+    d_lat, d_lng = lat_max - lat_min, lng_max - lng_min
+    cells = []
+    for i in (-1, 0, 1):
+        for j in (-1, 0, 1):
+            n_lat = lat + i * d_lat
+            if not -90 <= n_lat <= 90:
+                continue
+            n_lng = (lng + j * d_lng + 180) % 360 - 180
+            cell = geohash_encode(n_lat, n_lng, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def geohash_cell_size(precision: int, lat: float) -> t.Tuple[float, float]:
+    """
+    Return the height and width in metres of the geohash cells at a latitude
+    """
+    lat_bits = 5 * precision // 2
+    lng_bits = 5 * precision - lat_bits
+    metres = math.pi / 180 * EARTH_RADIUS
+    return (180 / 2 ** lat_bits * metres,
+            360 / 2 ** lng_bits * metres * math.cos(math.radians(min(abs(lat), 90))))
+
+
+def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Great-circle distance in metres
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def heading_diff(a: float, b: float) -> float:
+    diff = abs(a - b) % 360
+    return min(diff, 360 - diff)
+
+
+class StreetViewCache:
+    """
+    Street view frames stored by location, so a frame fetched for one route is
+    reused by any later request close enough in position and heading.
+
+    Frames are indexed by geohash cell and heading bucket. A lookup scans the
+    cells around the point in the adjacent heading buckets, and returns the
+    nearest frame within `max_distance` metres and `heading_tolerance` degrees.
+    The scanned cells are the shortest geohash prefix at least `max_distance`
+    wide at the point's latitude and its 8 neighbours. The least recently used
+    frames are evicted beyond `max_bytes`.
+
+    Args:
+        - path: SQLite file
+        - precision: geohash length of the stored cells
+        - heading_step: heading bucket width in degrees
+        - max_distance: max distance in metres to reuse a frame
+        - heading_tolerance: max heading difference in degrees to reuse a frame
+        - max_bytes: max total size of the images
+    """
+
+    _schema_ = """
+    CREATE TABLE IF NOT EXISTS frames (
+        id INTEGER PRIMARY KEY,
+        variant TEXT NOT NULL,
+        geohash TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        lat REAL NOT NULL,
+        lng REAL NOT NULL,
+        heading REAL NOT NULL,
+        image BLOB NOT NULL,
+        created REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS frames_cell ON frames (variant, geohash, bucket);
+    """
+
+    def __init__(self,
+                 path: str,
+                 precision: int = 9,
+                 heading_step: float = 10.0,
+                 max_distance: float = 4.0,
+                 heading_tolerance: float = 5.0,
+                 max_bytes: int = 1 << 30):
+        folder = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.path = path
+        self.precision = precision
+        self.heading_step = heading_step
+        self.buckets = max(1, int(round(360 / heading_step)))
+        self.max_distance = max_distance
+        self.heading_tolerance = heading_tolerance
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self._schema_)
+        self._migrate()
+        self.conn.commit()
+
+    def _migrate(self):
+        # Size and access time were added for the eviction
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(frames)")}
+        if "size" not in columns:
+            self.conn.execute("ALTER TABLE frames ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            self.conn.execute("UPDATE frames SET size = LENGTH(image)")
+        if "accessed" not in columns:
+            self.conn.execute("ALTER TABLE frames ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+            self.conn.execute("UPDATE frames SET accessed = created")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS frames_accessed ON frames (accessed)")
+
+    def bucket(self, heading: float) -> int:
+        return int(round((heading % 360) / self.heading_step)) % self.buckets
+
+    def cells(self, lat: float, lng: float) -> t.List[str]:
+        """
+        Return the geohash prefixes covering every point within `max_distance`
+        """
+        # Cells narrow towards the poles, size them at the far edge of the search
+        edge = abs(lat) + math.degrees(self.max_distance / EARTH_RADIUS)
+        precision = self.precision
+        while precision > 1 and min(geohash_cell_size(precision, edge)) < self.max_distance:
+            precision -= 1
+        return geohash_neighbors(geohash_encode(lat, lng, precision))
+
+    def get(self, lat: float, lng: float, heading: float, variant: str = "") -> t.Optional[bytes]:
+        """
+        Return the nearest cached frame matching the point, or None
+        """
+        cells = self.cells(lat, lng)
+        bucket = self.bucket(heading)
+        # Rounding to buckets moves a heading by up to half a step
+        spread = int(self.heading_tolerance // self.heading_step) + 1
+        buckets = sorted({(bucket + i) % self.buckets for i in range(-spread, spread + 1)})
+        # '{' sorts right after 'z', the last geohash character
+        query = (
+            "SELECT id, lat, lng, heading FROM frames WHERE variant = ? "
+            f"AND ({' OR '.join(['(geohash >= ? AND geohash < ?)'] * len(cells))}) "
+            f"AND bucket IN ({','.join('?' * len(buckets))})"
+        )
+        ranges = [bound for cell in cells for bound in (cell, cell + "{")]
+        with self._lock:
+            rows = self.conn.execute(query, (variant, *ranges, *buckets)).fetchall()
+            best = None
+            for id, f_lat, f_lng, f_heading in rows:
+                distance = haversine(lat, lng, f_lat, f_lng)
+                angle = heading_diff(heading, f_heading)
+                if distance > self.max_distance or angle > self.heading_tolerance:
+                    continue
+                score = (distance / self.max_distance if self.max_distance else 0) + \
+                    (angle / self.heading_tolerance if self.heading_tolerance else 0)
+                if best is None or score < best[0]:
+                    best = (score, id)
+            if best is None:
+                return None
+            row = self.conn.execute("SELECT image FROM frames WHERE id = ?", (best[1],)).fetchone()
+            self.conn.execute("UPDATE frames SET accessed = ? WHERE id = ?", (time.time(), best[1]))
+            self.conn.commit()
+        return bytes(row[0])
+
+    def put(self, lat: float, lng: float, heading: float, image: bytes, variant: str = ""):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO frames (variant, geohash, bucket, lat, lng, heading, image, "
+                "created, size, accessed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (variant, geohash_encode(lat, lng, self.precision), self.bucket(heading),
+                 lat, lng, heading % 360, sqlite3.Binary(image), now, len(image), now),
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM frames").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop the least recently used frames until the cache fits
+        rows = self.conn.execute("SELECT id, size FROM frames ORDER BY accessed, id")
+        stale = []
+        for id, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((id,))
+            total -= size
+        self.conn.executemany("DELETE FROM frames WHERE id = ?", stale)
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
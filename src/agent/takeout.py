@@ -1,16 +1,372 @@
+import datetime
+import hashlib
+import json
+import mimetypes
 import os
+import queue
+import re
+import shutil
+import tarfile
+import threading
+import typing as t
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .models import AlbumModel, MediaItemModel
+
+# Newer exports name sidecars 'IMG.JPG.supplemental-metadata.json', truncated
+# to e.g. 'IMG.JPG.supplemental-metad.json' or 'IMG.JPG.suppl.json' for long names
+_SIDECAR_INFIX = 'supplemental-metadata'
+# 'IMG.JPG(1).json' belongs to 'IMG(1).JPG'
+_DUPLICATE_INDEX = re.compile(r'^(?P<stem>.*)(?P<ext>\.[^.]+)(?P<index>\(\d+\))$')
+# The index follows the infix, 'IMG.JPG.supplemental-metadata(1).json'
+_INFIX_INDEX = re.compile(r'^(?P<infix>.*?)(?P<index>\(\d+\))?$')
+
+_ALBUM_METADATA = 'metadata.json'
+_SENTINEL = object()
+# Seconds between checks of the stop event while the output queue is full
+_PUT_INTERVAL = 0.1
+
+
+class _Stopped(Exception):
+    """
+    Raised in the readers once the consumer stopped iterating
+    """
+
+
+def _put(output: queue.Queue, item, stop: threading.Event) -> bool:
+    """
+    Put item into the bounded queue, give up once stop is set
+    """
+    while not stop.is_set():
+        try:
+            output.put(item, timeout=_PUT_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _remove_staged(photo: "PhotoFile"):
+    if photo.filepath and os.path.exists(photo.filepath):
+        os.remove(photo.filepath)
 
 
 class PhotoFile:
-    def __init__(self):
-        self.filename = ""
-        self.filepath = ""
-        self.exif_path = ""
-        self.need_exif = True
-        self.album = ""
+    """
+    A media file streamed out of a Takeout archive
+
+    Attributes:
+        - filename: media file name in the archive
+        - filepath: staged copy of the media on the disk
+        - exif_path: archive member of the json sidecar
+        - need_exif: no sidecar found, metadata has to come from the file itself
+        - album: album folder in the archive
+        - metadata: content of the json sidecar
+    """
+
+    def __init__(self,
+                 filename: str = "",
+                 filepath: str = "",
+                 exif_path: str = "",
+                 album: str = "",
+                 metadata: dict = None):
+        self.filename = filename
+        self.filepath = filepath
+        self.exif_path = exif_path
+        self.need_exif = metadata is None
+        self.album = album
+        self.metadata = metadata
+
+    def to_mediaitem(self) -> MediaItemModel:
+        metadata = self.metadata or {}
+        url = metadata.get("url") or ""
+        if url:
+            id = url.rstrip("/").rsplit("/", 1)[-1]
+        else:
+            # No Google id without a sidecar, derive a stable one from the path
+            key = f"{self.album}/{self.filename}".encode("utf-8")
+            id = "takeout-" + hashlib.sha1(key).hexdigest()
+
+        create_time = None
+        taken = metadata.get("photoTakenTime") or metadata.get("creationTime")
+        if taken and taken.get("timestamp"):
+            create_time = datetime.datetime.fromtimestamp(
+                int(taken["timestamp"]), datetime.timezone.utc
+            ).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        return MediaItemModel.parse_obj({
+            "id": id,
+            "description": metadata.get("description") or None,
+            "productUrl": url or None,
+            "mimeType": mimetypes.guess_type(self.filename)[0],
+            "mediaMetadata": {"createTime": create_time},
+            "filename": metadata.get("title") or self.filename,
+        })
+
+
+class _Pairer:
+    """
+    Pair media with their sidecars across all archive parts. Media are staged
+    as soon as they are read, sidecars are kept in memory until matched.
+    Beyond `max_unpaired` media waiting for their sidecar, the oldest one is
+    emitted without it, so the staged files stay bounded.
+    """
+
+    def __init__(self, output: queue.Queue, stop: threading.Event, max_unpaired: int):
+        self.output = output
+        self.stop = stop
+        self.max_unpaired = max_unpaired
+        self.media: t.Dict[str, PhotoFile] = {}
+        self.sidecars: t.Dict[str, t.Tuple[str, dict]] = {}
+        self.albums: t.Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def emit(self, photo: PhotoFile):
+        if not _put(self.output, photo, self.stop):
+            # Nobody will consume it anymore
+            _remove_staged(photo)
+            raise _Stopped()
+
+    @staticmethod
+    def sidecar_key(member: str) -> str:
+        folder, name = member.rsplit("/", 1) if "/" in member else ("", member)
+        name = name[:-len(".json")]
+        stem, _, tail = name.rpartition(".")
+        infix, index = _INFIX_INDEX.match(tail).group("infix", "index")
+        if stem and infix and _SIDECAR_INFIX.startswith(infix):
+            name = stem + (index or "")
+        match = _DUPLICATE_INDEX.match(name)
+        if match:
+            name = match["stem"] + match["index"] + match["ext"]
+        return f"{folder}/{name}"
+
+    def add_media(self, photo: PhotoFile, member: str):
+        with self._lock:
+            sidecar = self.sidecars.pop(member, None)
+            if sidecar is None:
+                self.media[member] = photo
+                if len(self.media) <= self.max_unpaired:
+                    return
+                photo = self.media.pop(next(iter(self.media)))
+        if sidecar is not None:
+            photo.exif_path, photo.metadata = sidecar
+            photo.need_exif = False
+        self.emit(photo)
+
+    def add_sidecar(self, member: str, metadata: dict):
+        key = self.sidecar_key(member)
+        with self._lock:
+            photo = self.media.pop(key, None)
+            if photo is None:
+                self.sidecars[key] = (member, metadata)
+                return
+        photo.exif_path, photo.metadata = member, metadata
+        photo.need_exif = False
+        self.emit(photo)
+
+    def add_album(self, folder: str, metadata: dict):
+        with self._lock:
+            self.albums[folder] = metadata
+
+    def flush(self):
+        """
+        Emit the media left without an exact sidecar match. Takeout truncates
+        long names, so try a sidecar whose name is a prefix of the media name.
+        """
+        with self._lock:
+            sidecars, self.sidecars = self.sidecars, {}
+
+        # Readers are done, media not emitted yet stay listed for the cleanup
+        for member in sorted(self.media):
+            photo = self.media.pop(member)
+            for key in sorted(sidecars, key=len, reverse=True):
+                if key.rsplit("/", 1)[0] == member.rsplit("/", 1)[0] and member.startswith(key):
+                    photo.exif_path, photo.metadata = sidecars.pop(key)
+                    photo.need_exif = False
+                    break
+            self.emit(photo)
 
 
 class TakeoutLoader:
-    def __init__(self, root: str): ...
+    """
+    Stream Google Takeout archives (.zip, .tgz/.tar.gz) without extracting them.
+
+    Each media file is copied once from the archive into the staging folder,
+    paired with its json sidecar and handed over to the caller; sidecars and
+    album metadata stay in memory. Archive parts are decompressed in parallel,
+    and at most `max_pending` paired files wait in the staging folder, plus as
+    many media waiting for their sidecar.
+
+    Args:
+        - root: staging folder for the media streamed out of the archives
+        - workers: archive parts decompressed at the same time
+        - max_pending: paired files waiting to be consumed, and media waiting
+          for their sidecar
+    """
+    _chunk_size_ = 1 << 20
+
+    def __init__(self, root: str, workers: int = 4, max_pending: int = 256):
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.albums: t.Dict[str, dict] = {}
+        if not os.path.exists(self.root):
+            os.makedirs(self.root)
+
+    @staticmethod
+    def find_archives(path: str) -> t.List[str]:
+        """
+        Return the archive parts of a path, either an archive or a folder of parts
+        """
+        if os.path.isfile(path):
+            return [path]
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.endswith((".zip", ".tgz", ".tar.gz"))
+        )
+
+    def load(self, path) -> t.Iterator[PhotoFile]:
+        """
+        Yield paired media of the archives under path (an archive, a folder of
+        parts or a list of both). The caller owns the staged file once yielded.
+        Stopping early, e.g. closing the generator, stops the readers and
+        removes the files staged but not yielded yet.
+        """
+        paths = [path] if isinstance(path, str) else list(path)
+        archives = [archive for p in paths for archive in self.find_archives(p)]
+
+        output = queue.Queue(maxsize=self.max_pending)
+        stop = threading.Event()
+        pairer = _Pairer(output, stop, self.max_pending)
+        # Shared with the readers, album metadata shows up while loading
+        pairer.albums = self.albums
+
+        def read_all():
+            try:
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    # Surface the first failure of a part
+                    for future in [executor.submit(self._read_archive, archive, pairer)
+                                   for archive in archives]:
+                        future.result()
+                pairer.flush()
+            except _Stopped:
+                pass
+            except BaseException as e:
+                _put(output, e, stop)
+            finally:
+                _put(output, _SENTINEL, stop)
+
+        reader = threading.Thread(target=read_all, daemon=True)
+        reader.start()
+        try:
+            while True:
+                item = output.get()
+                if item is _SENTINEL:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            reader.join()
+            # Staged files left behind by the readers
+            while not output.empty():
+                item = output.get_nowait()
+                if isinstance(item, PhotoFile):
+                    _remove_staged(item)
+            for photo in pairer.media.values():
+                _remove_staged(photo)
+            pairer.media.clear()
+
+    def ingest(self, path, manager, batch_size: int = 500) -> int:
+        """
+        Load the archives and back up their media with `manager.backup_album`.
+        Every `batch_size` photos, the photos of each album are backed up, so
+        at most `batch_size` loaded photos wait in the staging folder.
+        Return the number of photos.
+        """
+        batches: t.Dict[str, list] = {}
+        count = pending = 0
+        photos = self.load(path)
+        try:
+            for photo in photos:
+                batches.setdefault(photo.album, []).append(photo)
+                count += 1
+                pending += 1
+                if pending >= batch_size:
+                    self._backup_batches(manager, batches)
+                    pending = 0
+            self._backup_batches(manager, batches)
+        finally:
+            photos.close()
+            # Photos of a failed batch or left after an error
+            for batch in batches.values():
+                for photo in batch:
+                    _remove_staged(photo)
+        return count
+
+    def album_model(self, album: str) -> AlbumModel:
+        """
+        Takeout has no album ids, derive one from the album folder. The folder
+        name is the title, album metadata may only be read after the first batch.
+        """
+        return AlbumModel.parse_obj({
+            "id": "takeout-" + hashlib.sha1(album.encode("utf-8")).hexdigest(),
+            "title": os.path.basename(album) or "Takeout",
+        })
+
+    def _backup_batches(self, manager, batches: t.Dict[str, t.List[PhotoFile]]):
+        while batches:
+            album = next(iter(batches))
+            self._backup_batch(manager, album, batches[album])
+            del batches[album]
+
+    def _backup_batch(self, manager, album: str, batch: t.List[PhotoFile]):
+        photo_list = [(photo.to_mediaitem(), photo.filepath) for photo in batch]
+        manager.backup_album(self.album_model(album), photo_list)
+        # Staged files are left behind unless the manager moved them
+        for photo in batch:
+            if os.path.exists(photo.filepath):
+                os.remove(photo.filepath)
+
+    def _stage(self, fileobj, member: str) -> str:
+        digest = hashlib.sha1(member.encode("utf-8")).hexdigest()
+        filepath = os.path.join(self.root, f"{digest}_{os.path.basename(member)}")
+        with open(filepath, "wb") as f:
+            shutil.copyfileobj(fileobj, f, self._chunk_size_)
+        return filepath
+
+    def _handle(self, pairer: _Pairer, member: str, open_member: t.Callable):
+        folder, name = member.rsplit("/", 1) if "/" in member else ("", member)
+        mimetype = mimetypes.guess_type(name)[0] or ""
+        if name == _ALBUM_METADATA:
+            with open_member() as f:
+                pairer.add_album(folder, json.load(f))
+        elif name.endswith(".json"):
+            with open_member() as f:
+                pairer.add_sidecar(member, json.load(f))
+        elif mimetype.startswith(("image/", "video/")):
+            with open_member() as f:
+                filepath = self._stage(f, member)
+            photo = PhotoFile(filename=name, filepath=filepath, album=folder)
+            pairer.add_media(photo, f"{folder}/{name}")
 
-    def load(self, path): ...
+    def _read_archive(self, archive: str, pairer: _Pairer):
+        if archive.endswith(".zip"):
+            with zipfile.ZipFile(archive) as zf:
+                for info in zf.infolist():
+                    if pairer.stop.is_set():
+                        raise _Stopped()
+                    if info.is_dir():
+                        continue
+                    self._handle(pairer, info.filename, lambda: zf.open(info))
+        else:
+            # Stream mode, the tarball is read once front to back
+            with tarfile.open(archive, "r|*") as tf:
+                for info in tf:
+                    if pairer.stop.is_set():
+                        raise _Stopped()
+                    if not info.isfile():
+                        continue
+                    self._handle(pairer, info.name, lambda: tf.extractfile(info))
@@ -0,0 +1,84 @@
+import os
+import typing as t
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def location_text(filename: str) -> t.Optional[str]:
+    """
+    Overlay text of a street view frame, the location is read back from
+    names like 'streetview_{index}_{lat}_{lng}.jpg'
+    """
+    try:
+        _, _, latitude, longitude = os.path.splitext(os.path.basename(filename))[0].split("_")
+    except ValueError:
+        return None
+    return f"Lat: {latitude}, Lon: {longitude}"
+
+
+def annotate_frame(frame: np.ndarray,
+                   text: str,
+                   position: t.Tuple[int, int] = (10, 30),
+                   font_scale: float = 0.5,
+                   thickness: int = 1) -> np.ndarray:
+    """
+    Draw white text on a grey box, in place
+    """
+    text_width, text_height = cv2.getTextSize(text, FONT, font_scale, thickness)[0]
+    rect_start = (position[0] - 5, position[1] - text_height - 5)
+    rect_end = (position[0] + text_width + 5, position[1] + 5)
+    cv2.rectangle(frame, rect_start, rect_end, (50, 50, 50), -1)
+    cv2.putText(frame, text, position, FONT, font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
+    return frame
+
+
+def prepare_frame(frame: t.Optional[np.ndarray], name: str) -> np.ndarray:
+    if frame is None:
+        raise RuntimeError(f"Failed to decode image {name}")
+    text = location_text(name)
+    if text is None:
+        print(f"Failed to parse latitude and longitude from {name}")
+        return frame
+    return annotate_frame(frame, text)
+
+
+def load_frame(path: str) -> np.ndarray:
+    """
+    Read and annotate a frame from a file
+    """
+    return prepare_frame(cv2.imread(path), os.path.basename(path))
+
+
+def decode_frame(data: bytes, name: str) -> np.ndarray:
+    """
+    Decode and annotate a frame from encoded image bytes, no file involved
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    return prepare_frame(cv2.imdecode(buffer, cv2.IMREAD_COLOR), name)
+
+
+def write_video(frames: t.Iterable[np.ndarray], path: str, fps: float = 2) -> int:
+    """
+    Encode frames into an mp4 video, the size is taken from the first frame.
+    Return the number of frames written.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    writer = None
+    count = 0
+    try:
+        for frame in frames:
+            if writer is None:
+                height, width = frame.shape[:2]
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+            writer.write(frame)
+            count += 1
+    finally:
+        if writer is not None:
+            writer.release()
+    return count
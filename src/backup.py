@@ -1,10 +1,44 @@
 import os
-import shutil
 import json
 import glob
+import filecmp
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+try:
+    # Optional faster parser for the metadata sidecars
+    import orjson
+except ImportError:
+    orjson = None
 
 from .agent.models import AlbumModel, MediaItemModel
-from .shortcut import ShortCut
+from .index import BackupIndex
+from .store import ContentStore
+from .placement import COPY, HARDLINK, MOVE, place_file
+from .links import LinkBackend, get_link_backend
+from .batch import MetadataWriter, write_json_atomic
+
+
+def load_json(path: str) -> dict:
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def scan_media_files(folder: str) -> dict:
+    """
+    Scan the folder once and map every media file by its path without extension,
+    so a sidecar 'name.json' resolves to 'name.jpg' with a dict lookup
+    """
+    files_by_stem = {}
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.name.endswith(('.json', '.tmp')) or not entry.is_file():
+                continue
+            files_by_stem.setdefault(os.path.splitext(entry.path)[0], entry.path)
+    return files_by_stem
+
 
 class Photo:
     def __init__(self,
@@ -12,17 +46,22 @@ class Photo:
                  filename: str,
                  filepath: str,
                  metadata_path: str,
-                 metadata: dict=None):
+                 metadata: dict=None,
+                 sha256: str=None):
         self.id = id
         self.filename = filename
         self.filepath = filepath
         self.metadata_path = metadata_path
+        self._metadata = metadata
+        # Content digest, only known for photos placed through a ContentStore
+        self.sha256 = sha256
 
-        if not metadata:
-            with open(self.metadata_path, 'r') as f:
-                self.metadata = json.load(f)
-        else:
-            self.metadata = metadata
+    @property
+    def metadata(self) -> dict:
+        # Loaded on first access, photos restored from the index don't read it
+        if not self._metadata:
+            self._metadata = load_json(self.metadata_path)
+        return self._metadata
 
     @classmethod
     def from_filepath(cls, filepath: str):
@@ -30,8 +69,7 @@ class Photo:
         Create photo object from filepath
         """
         metadata_path = cls._get_metadata_path(filepath)
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
+        metadata = load_json(metadata_path)
 
         id = metadata['id']
         filename = metadata['filename']
@@ -43,57 +81,106 @@ class Photo:
                    metadata=metadata)
 
     @classmethod
-    def from_metadata_path(cls, metadata_path: str):
+    def from_metadata_path(cls, metadata_path: str, files_by_stem: dict=None):
         """
         Create photo object from photo metadata path
+
+        Args:
+            - metadata_path: path to the json sidecar
+            - files_by_stem: output of `scan_media_files` on the sidecar folder.
+              Without it the folder is searched with a glob for every call.
         """
         # Get photo real path
-        ext = metadata_path.split('.')[-1]
-        pattern = f'{metadata_path[:-len(ext)]}*'
-        filepath = ''
-        for file in glob.glob(pattern):
-            if file.endswith('.json'):
-                continue
-            filepath = file
-            break
+        if files_by_stem is not None:
+            filepath = files_by_stem.get(os.path.splitext(metadata_path)[0], '')
+        else:
+            ext = metadata_path.split('.')[-1]
+            pattern = f'{glob.escape(metadata_path[:-len(ext)])}*'
+            filepath = ''
+            for file in glob.glob(pattern):
+                if file.endswith('.json'):
+                    continue
+                filepath = file
+                break
         if len(filepath) == 0:
             raise RuntimeError(f"Photo not found according {metadata_path}")
 
         return cls.from_filepath(filepath)
 
     @classmethod
-    def from_mediaitem(cls, model: MediaItemModel, src: str, album_path: str):
+    def from_mediaitem(cls, model: MediaItemModel, src: str, album_path: str,
+                       store: ContentStore=None, placement: str=COPY,
+                       writer: MetadataWriter=None):
         """
         Create photo object from mediaitem and copy file to album.
         The filename supposed to be f'{date}_{filename}'
+
+        If a content store is given, the file is added to the store and
+        hardlinked into the album instead of copied. `placement` picks how src
+        is placed, e.g. 'move' for a staging file, see `place_file`.
+        If a writer is given, the sidecar is only written on its commit.
+
+        A name whose sidecar is already taken by another photo, e.g. two
+        'IMG_0001.JPG' or a Live Photo's 'IMG_1234.HEIC' and 'IMG_1234.MOV',
+        is prefixed with the media id.
         """
         filename = model.filename
         id = model.id
 
         filepath = os.path.join(album_path, filename)
-        if os.path.exists(filepath):
-            raise RuntimeError(f'Photo {id} has already existed on {filepath}')
+        if cls._is_taken(filepath, writer):
+            filepath = os.path.join(album_path, f'{id}_{filename}')
+            if cls._is_taken(filepath, writer):
+                raise RuntimeError(f'Photo {id} has already existed on {filepath}')
+        metadata_filepath = cls._get_metadata_path(filepath)
+
+        sha256 = None
+        if os.path.exists(filepath) and (not os.path.exists(src)
+                                         or filecmp.cmp(src, filepath, shallow=False)):
+            # Placed by an interrupted backup before its sidecar was committed,
+            # e.g. moved from src, keep it as it can't always be placed again
+            if store is not None:
+                sha256, _ = store.put(filepath, HARDLINK)
+            if placement == MOVE and os.path.exists(src):
+                os.remove(src)
+        else:
+            if os.path.exists(filepath):
+                # A partial copy of src, placed again below
+                os.remove(filepath)
 
-        # Copy file
-        shutil.copyfile(src, filepath)
+            # Copy file
+            if store is not None:
+                sha256, blob_path = store.put(src, placement)
+                store.link(blob_path, filepath)
+            else:
+                place_file(src, filepath, placement)
 
         # Save metadata
-        metadata_filepath = cls._get_metadata_path(filepath)
         metadata = model.dict()
-        with open(metadata_filepath, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        if writer is not None:
+            writer.add_json(metadata_filepath, metadata, indent=2)
+        else:
+            write_json_atomic(metadata_filepath, metadata, indent=2)
 
         return cls(id=id,
                    filename=filename,
                    filepath=filepath,
-                   metadata_path=metadata,
-                   metadata=metadata)
+                   metadata_path=metadata_filepath,
+                   metadata=metadata,
+                   sha256=sha256)
 
     @staticmethod
     def _get_metadata_path(filepath: str):
         ext = filepath.split('.')[-1]
         return filepath[:-len(ext)] + 'json'
 
+    @classmethod
+    def _is_taken(cls, filepath: str, writer: MetadataWriter=None) -> bool:
+        # The sidecar marks the name as used, on the disk or queued in the writer
+        metadata_path = cls._get_metadata_path(filepath)
+        return (os.path.exists(metadata_path)
+                or (writer is not None and writer.is_pending(metadata_path)))
+
 class Album:
 
     def __init__(self,
@@ -101,52 +188,68 @@ class Album:
                  title: str,
                  filepath: str,
                  metadata_path: str,
-                 metadata: dict=None):
+                 metadata: dict=None,
+                 photo_by_id: dict=None,
+                 executor: Executor=None,
+                 link_backend: LinkBackend=None):
+        """
+        Args:
+            - photo_by_id: known photos of the album, skip scanning the folder
+            - executor: parse the photo sidecars concurrently on this executor
+            - link_backend: how album entries link to the real files,
+              default to `get_link_backend()`
+        """
         self.id = id
         self.title = title
         self.filepath = filepath
         self.metadata_path = metadata_path
 
-        # windows shortcut shell
-        self.shortcut_tool = ShortCut()
+        self.link_backend = link_backend or get_link_backend()
 
         if not metadata:
             # Load metadata
-            with open(self.metadata_path, 'r') as f:
-                self.metadata = json.load(f)
+            self.metadata = load_json(self.metadata_path)
         else:
             self.metadata = metadata
 
-        # Load all photos in the album folder
+        if photo_by_id is not None:
+            # Photos are already known, e.g. restored from the index
+            self.photo_by_id = photo_by_id
+            return
+
+        # Load all photos in the album folder, resolve links to the real paths
+        real_paths = [target for _, target in self.link_backend.list_links(self.filepath)]
+
+        if executor is not None:
+            # map keeps the input order, so the result matches the serial load
+            photos = executor.map(Photo.from_filepath, real_paths)
+        else:
+            photos = map(Photo.from_filepath, real_paths)
+
         self.photo_by_id = {}
-        for dir in os.listdir(self.filepath):
-            # Skip album metadata
-            if dir.endswith('.json'):
-                continue
-            abspath = os.path.join(self.filepath, dir)
-            # Get real path
-            real_path = self.shortcut_tool.get_target_path(abspath)
-            photo = Photo.from_filepath(real_path)
+        for photo in photos:
             self.photo_by_id[photo.id] = photo
 
     @classmethod
-    def from_filepath(cls, filepath: str):
+    def from_filepath(cls, filepath: str, executor: Executor=None,
+                      link_backend: LinkBackend=None):
         """
         Create album object from filepath. The path supposed to be a folder
         """
         title = os.path.basename(filepath)
         metadata_path = cls._get_metadata_path(filepath, title)
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
+        metadata = load_json(metadata_path)
 
         return cls(id=metadata['id'],
                    title=title,
                    filepath=filepath,
                    metadata_path=metadata_path,
-                   metadata=metadata)
+                   metadata=metadata,
+                   executor=executor,
+                   link_backend=link_backend)
 
     @classmethod
-    def from_album(cls, model: AlbumModel, root: str):
+    def from_album(cls, model: AlbumModel, root: str, link_backend: LinkBackend=None):
         """
         Create album object from album, and create the folder on the root path
         """
@@ -160,29 +263,34 @@ class Album:
 
             # Save metadata
             metadata = model.dict()
-            with open(metadata_path, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, ensure_ascii=False, indent=2)
+            write_json_atomic(metadata_path, metadata, ensure_ascii=False, indent=2)
+        else:
+            metadata = load_json(metadata_path)
 
         return cls(id=model.id,
                    title=title,
                    filepath=filepath,
                    metadata_path=metadata_path,
-                   metadata=metadata)
+                   metadata=metadata,
+                   link_backend=link_backend)
 
     @staticmethod
     def _get_metadata_path(root: str, title: str):
         return os.path.join(root, f'{title}_album.json')
 
-    def add_photo(self, photo: Photo):
+    def add_photo(self, photo: Photo, writer: MetadataWriter=None):
         """
-        Add photo into album. Create a shortcut to link real file
+        Add photo into album. Create a link to the real file, on the writer
+        commit if a writer is given
         """
         if photo.id in self.photo_by_id:
             return
 
-        basename = os.path.basename(photo.filepath)
-        dst = os.path.join(self.filepath, f'{basename}.lnk')
-        self.shortcut_tool.create_shortcut(photo.filepath, dst)
+        dst = os.path.join(self.filepath, self.link_backend.link_name(photo.filepath))
+        if writer is not None:
+            writer.add_link(photo.filepath, dst)
+        else:
+            self.link_backend.create_link(photo.filepath, dst)
 
         self.photo_by_id[photo.id] = photo
 
@@ -190,9 +298,25 @@ class Album:
 class BackupManager:
     _all_photo_folder_ = '0_all'
 
-    def __init__(self, root: str):
+    def __init__(self, root: str, use_index: bool=True, workers: int=None,
+                 dedup: bool=False, placement: str=COPY, link_backend: str=None,
+                 batch_size: int=500, fsync: bool=False):
         """
         Load all albums and photos on the root path
+
+        Args:
+            - root: backup root folder
+            - use_index: restore albums and photos from the persistent index and
+              only rescan the folders changed since the last run
+            - workers: parse metadata sidecars on a pool of this many threads
+            - dedup: keep photo content in a content-addressed store and hardlink
+              it into the all photo folder, identical files are stored once
+            - placement: how backed up files are placed from their source,
+              'move', 'hardlink', 'reflink', 'copy' or 'auto', see `place_file`
+            - link_backend: how albums link to the photos, 'shortcut', 'symlink'
+              or 'manifest'. Default to shortcuts on Windows and symlinks elsewhere
+            - batch_size: photos per metadata commit in `backup_album`
+            - fsync: fsync sidecars and their folders on every commit
         """
         root = os.path.abspath(root)
         self.root = root
@@ -203,30 +327,152 @@ class BackupManager:
 
         self.albums_by_id = {}
         self.photo_by_id = {}
-        # Load all album
-        for dir in os.listdir(root):
-            abspath = os.path.join(root, dir)
-            # Skip all photo folder
-            if abspath == self.all_photo_folder:
+        self.photo_by_hash = {}
+        self.store = ContentStore(root) if dedup else None
+        self.placement = placement
+        self.link_backend = get_link_backend(link_backend)
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.index = None
+        executor = ThreadPoolExecutor(max_workers=workers) if workers else None
+        try:
+            if use_index:
+                self.index = BackupIndex(os.path.join(root, BackupIndex.filename))
+                self._load_from_index(executor)
+            else:
+                self._load_from_folders(executor)
+        finally:
+            if executor:
+                executor.shutdown()
+
+        for photo in self.photo_by_id.values():
+            if photo.sha256:
+                self.photo_by_hash.setdefault(photo.sha256, photo)
+
+    def _album_folders(self):
+        for dir in sorted(os.listdir(self.root)):
+            abspath = os.path.join(self.root, dir)
+            # Skip all photo folder and the content store
+            if abspath == self.all_photo_folder or dir == ContentStore.folder:
                 continue
-            # Get album
             if os.path.isdir(abspath):
-                album = Album.from_filepath(abspath)
-                self.albums_by_id[album.id] = album
+                yield abspath
 
-                for id, photo in album.photo_by_id.items():
-                    self.photo_by_id[id] = photo
+    def _load_photos(self, metadata_paths: list, executor: Executor=None):
+        """
+        Create photos from sidecars in the all photo folder, in the input order
+        """
+        files_by_stem = scan_media_files(self.all_photo_folder)
+
+        def load(metadata_path):
+            return Photo.from_metadata_path(metadata_path, files_by_stem)
+
+        if executor is not None:
+            return executor.map(load, metadata_paths)
+        return map(load, metadata_paths)
+
+    def _list_metadata_paths(self):
+        return [os.path.join(self.all_photo_folder, dir)
+                for dir in sorted(os.listdir(self.all_photo_folder))
+                if dir.endswith('.json')]
+
+    def _load_from_folders(self, executor: Executor=None):
+        # Load all album
+        for abspath in self._album_folders():
+            album = Album.from_filepath(abspath, executor, self.link_backend)
+            self.albums_by_id[album.id] = album
+
+            for id, photo in album.photo_by_id.items():
+                self.photo_by_id[id] = photo
 
         # Load all photo
-        for dir in os.listdir(self.all_photo_folder):
-            if dir.endswith('.json'):
-                abspath = os.path.join(self.all_photo_folder, dir)
-                photo = Photo.from_metadata_path(abspath)
+        for photo in self._load_photos(self._list_metadata_paths(), executor):
+            # Avoid loading photo again
+            if photo.id not in self.photo_by_id:
+                self.photo_by_id[photo.id] = photo
+
+    def _load_from_index(self, executor: Executor=None):
+        index = self.index
+        folder_mtimes = index.get_folder_mtimes()
+        indexed_photos = {
+            id: Photo(id, filename, filepath, metadata_path, sha256=sha256)
+            for id, filename, filepath, metadata_path, sha256 in index.get_photos()
+        }
+        album_photo_ids = index.get_album_photo_ids()
+        indexed_albums = {row[2]: row for row in index.get_albums()}
+
+        # Load all album, rescan only the changed folders
+        for abspath in self._album_folders():
+            mtime = os.stat(abspath).st_mtime_ns
+            row = indexed_albums.pop(abspath, None)
+            photo_ids = album_photo_ids.get(row[0], []) if row else []
+            if (row and folder_mtimes.get(abspath) == mtime
+                    and all(id in indexed_photos for id in photo_ids)):
+                album = Album(*row, photo_by_id={
+                    id: indexed_photos[id] for id in photo_ids
+                }, link_backend=self.link_backend)
+            else:
+                album = Album.from_filepath(abspath, executor, self.link_backend)
+                # Rescanned photos are read from their sidecars, keep the known digest
+                for id, photo in album.photo_by_id.items():
+                    if photo.sha256 is None and id in indexed_photos:
+                        photo.sha256 = indexed_photos[id].sha256
+                self._index_album(album)
+            self.albums_by_id[album.id] = album
+
+            for id, photo in album.photo_by_id.items():
+                self.photo_by_id[id] = photo
 
+        # Forget albums removed from the disk
+        for filepath, row in indexed_albums.items():
+            index.remove_album(row[0])
+            index.remove_folder(filepath)
+
+        # Load all photo, rescan only if the folder changed
+        mtime = os.stat(self.all_photo_folder).st_mtime_ns
+        if folder_mtimes.get(self.all_photo_folder) == mtime:
+            for id, photo in indexed_photos.items():
+                self.photo_by_id.setdefault(id, photo)
+        else:
+            photo_by_metadata_path = {
+                photo.metadata_path: photo for photo in indexed_photos.values()
+            }
+            new_metadata_paths = []
+            for abspath in self._list_metadata_paths():
+                photo = photo_by_metadata_path.pop(abspath, None)
+                if photo is None:
+                    new_metadata_paths.append(abspath)
                 # Avoid loading photo again
-                if photo.id not in self.photo_by_id:
+                elif photo.id not in self.photo_by_id:
                     self.photo_by_id[photo.id] = photo
 
+            if new_metadata_paths:
+                for photo in self._load_photos(new_metadata_paths, executor):
+                    index.put_photo(photo.id, photo.filename, photo.filepath, photo.metadata_path)
+                    if photo.id not in self.photo_by_id:
+                        self.photo_by_id[photo.id] = photo
+
+            # Forget photos removed from the disk
+            index.remove_photos(
+                photo.id for photo in photo_by_metadata_path.values()
+                if photo.id not in self.photo_by_id
+            )
+            index.set_folder_mtime(self.all_photo_folder, mtime)
+
+        index.commit()
+
+    def _index_album(self, album: 'Album'):
+        for photo in album.photo_by_id.values():
+            self.index.put_photo(photo.id, photo.filename, photo.filepath, photo.metadata_path)
+        self.index.put_album(album.id, album.title, album.filepath, album.metadata_path,
+                             album.metadata, album.photo_by_id.keys())
+        self.index.set_folder_mtime(album.filepath, os.stat(album.filepath).st_mtime_ns)
+
+    def close(self):
+        if self.index:
+            self.index.close()
+            self.index = None
+
     def check_album_existed(self, id: str):
         return id in self.albums_by_id
 
@@ -235,7 +481,9 @@ class BackupManager:
 
     def backup_album(self, model: AlbumModel, photo_list: list):
         """
-        Backup album
+        Backup album. Sidecars and links are written in batches of
+        `batch_size` photos, each batch is committed at once. On errors the
+        photos placed so far are still committed before raising.
 
         Args:
             - model:
@@ -245,33 +493,81 @@ class BackupManager:
         """
         if not self.check_album_existed(model.id):
             # Create album
-            album = Album.from_album(model, self.root)
+            album = Album.from_album(model, self.root, self.link_backend)
 
             self.albums_by_id[album.id] = album
         else:
             album = self.albums_by_id[model.id]
 
-        for photo_model, src in photo_list:
-            photo = self.backup_photo(photo_model, src)
-            album.add_photo(photo)
+        # Photos added since the last commit, forgotten if it never happens
+        batch = []
+        try:
+            with MetadataWriter(self.link_backend, self.fsync) as writer:
+                for i, (photo_model, src) in enumerate(photo_list, 1):
+                    new = not self.check_photo_existed(photo_model.id)
+                    photo = self.backup_photo(photo_model, src, writer)
+                    if photo.id not in album.photo_by_id:
+                        batch.append((photo, new))
+                    album.add_photo(photo, writer)
+                    if i % self.batch_size == 0:
+                        writer.commit()
+                        batch = []
+        except BaseException:
+            self._rollback(album, batch)
+            raise
+
+        if self.index:
+            # Everything written to the folders is recorded, keep them unchanged
+            self._index_album(album)
+            self.index.set_folder_mtime(self.all_photo_folder,
+                                        os.stat(self.all_photo_folder).st_mtime_ns)
+            self.index.commit()
 
         return album
 
-    def backup_photo(self, model: MediaItemModel, src: str):
+    def _rollback(self, album: 'Album', batch: list):
+        """
+        Forget the photos of an interrupted batch whose sidecar or album link
+        was not written, so a retry backs them up again
+
+        Args:
+            - batch: a list of tuple '(Photo, new)', new if the photo was
+              backed up by this batch
+        """
+        linked = {os.path.realpath(target)
+                  for _, target in self.link_backend.list_links(album.filepath)}
+        for photo, new in batch:
+            if os.path.realpath(photo.filepath) not in linked:
+                album.photo_by_id.pop(photo.id, None)
+            if new and not os.path.exists(photo.metadata_path):
+                del self.photo_by_id[photo.id]
+                if self.photo_by_hash.get(photo.sha256) is photo:
+                    del self.photo_by_hash[photo.sha256]
+                if self.index:
+                    self.index.remove_photos([photo.id])
+
+    def backup_photo(self, model: MediaItemModel, src: str, writer: MetadataWriter=None):
         """
         Backup photo
 
         Args:
             - model:
             - src: path to photo file
+            - writer: defer the sidecar write to the writer commit
         Return:
             Photo
         """
         if self.check_photo_existed(model.id):
             return self.photo_by_id[model.id]
 
-        photo = Photo.from_mediaitem(model, src, self.all_photo_folder)
+        photo = Photo.from_mediaitem(model, src, self.all_photo_folder, self.store,
+                                     self.placement, writer)
         self.photo_by_id[photo.id] = photo
+        if photo.sha256:
+            self.photo_by_hash.setdefault(photo.sha256, photo)
+        if self.index:
+            self.index.put_photo(photo.id, photo.filename, photo.filepath, photo.metadata_path,
+                                 photo.sha256)
 
         return photo
 
@@ -0,0 +1,115 @@
+import json
+import os
+import typing as t
+
+from .links import LinkBackend
+
+
+def write_json_atomic(path: str, data: dict, fsync: bool=False, **kwargs):
+    """
+    Write json to a temp file and rename it over path, readers never see a
+    half-written file
+    """
+    tmp_path = _write_tmp(path, data, fsync, **kwargs)
+    os.replace(tmp_path, path)
+    if fsync:
+        _fsync_folder(os.path.dirname(path))
+
+
+def _write_tmp(path: str, data: dict, fsync: bool, **kwargs) -> str:
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **kwargs)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    return tmp_path
+
+
+def _fsync_folder(folder: str):
+    # Directories can't be opened on Windows, the rename is durable there anyway
+    if os.name == 'nt':
+        return
+    fd = os.open(folder or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class MetadataWriter:
+    """
+    Accumulate metadata sidecars and album links, and write them together on
+    commit. Sidecars go to temp files first and are renamed in place only once
+    all of them are written; links are created through the backend in one
+    call, e.g. a single manifest write.
+
+    Usage:
+        with MetadataWriter(link_backend) as writer:
+            writer.add_json(path, metadata)
+            writer.add_link(target, link_path)
+    """
+
+    def __init__(self, link_backend: LinkBackend, fsync: bool=False):
+        self.link_backend = link_backend
+        self.fsync = fsync
+        self._jsons: t.List[t.Tuple[str, dict, dict]] = []
+        self._json_paths: t.Set[str] = set()
+        self._links: t.List[t.Tuple[str, str]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Queued entries describe files already in place, keep them on errors too
+        self.commit()
+
+    def add_json(self, path: str, data: dict, **kwargs):
+        """
+        Queue a json file, kwargs are passed to json.dump. A path can only be
+        queued once per commit, its temp file would be shared.
+        """
+        if path in self._json_paths:
+            raise RuntimeError(f'{path} is already queued')
+        self._json_paths.add(path)
+        self._jsons.append((path, data, kwargs))
+
+    def is_pending(self, path: str) -> bool:
+        """
+        Return whether a json file is queued but not committed yet
+        """
+        return path in self._json_paths
+
+    def add_link(self, target: str, link_path: str):
+        self._links.append((target, link_path))
+
+    def discard(self):
+        self._jsons = []
+        self._json_paths = set()
+        self._links = []
+
+    def commit(self):
+        jsons, links = self._jsons, self._links
+        self.discard()
+
+        tmp_paths = []
+        try:
+            for path, data, kwargs in jsons:
+                tmp_paths.append(_write_tmp(path, data, self.fsync, **kwargs))
+        except BaseException:
+            for tmp_path in tmp_paths:
+                os.remove(tmp_path)
+            raise
+
+        folders = set()
+        for (path, _, _), tmp_path in zip(jsons, tmp_paths):
+            os.replace(tmp_path, path)
+            folders.add(os.path.dirname(path))
+
+        if links:
+            self.link_backend.create_links(links)
+            folders.update(os.path.dirname(link_path) for _, link_path in links)
+
+        if self.fsync:
+            for folder in folders:
+                _fsync_folder(folder)
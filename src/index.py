@@ -0,0 +1,170 @@
+import json
+import os
+import sqlite3
+import typing as t
+
+
+class BackupIndex:
+    """
+    Persistent SQLite index of the albums and photos under a backup root.
+
+    Each folder (album folders and the all photo folder) is recorded with its
+    mtime, so the backup manager only rescans the folders that changed since
+    the last run.
+    """
+    filename = '.backup_index.sqlite'
+
+    _schema_ = '''
+    CREATE TABLE IF NOT EXISTS folders (
+        path TEXT PRIMARY KEY,
+        mtime INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS albums (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        filepath TEXT NOT NULL,
+        metadata_path TEXT NOT NULL,
+        metadata TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS photos (
+        id TEXT PRIMARY KEY,
+        filename TEXT NOT NULL,
+        filepath TEXT NOT NULL,
+        metadata_path TEXT NOT NULL,
+        size INTEGER,
+        mtime INTEGER,
+        sha256 TEXT
+    );
+    CREATE TABLE IF NOT EXISTS album_photos (
+        album_id TEXT NOT NULL,
+        photo_id TEXT NOT NULL,
+        PRIMARY KEY (album_id, photo_id)
+    );
+    CREATE TABLE IF NOT EXISTS album_sync (
+        album_id TEXT PRIMARY KEY,
+        media_items_count TEXT,
+        cover_photo_id TEXT,
+        last_synced REAL,
+        last_seen REAL
+    );
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self._schema_)
+        self._migrate()
+        self.conn.commit()
+
+    def _migrate(self):
+        # Add columns introduced after the index was first created
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(photos)')}
+        if 'sha256' not in columns:
+            self.conn.execute('ALTER TABLE photos ADD COLUMN sha256 TEXT')
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    # Folders
+    def get_folder_mtimes(self) -> t.Dict[str, int]:
+        return dict(self.conn.execute('SELECT path, mtime FROM folders'))
+
+    def set_folder_mtime(self, path: str, mtime: int):
+        self.conn.execute('INSERT OR REPLACE INTO folders VALUES (?, ?)', (path, mtime))
+
+    def remove_folder(self, path: str):
+        self.conn.execute('DELETE FROM folders WHERE path = ?', (path,))
+
+    # Albums
+    def get_albums(self) -> t.List[t.Tuple[str, str, str, str, dict]]:
+        """
+        Return a list of tuple '(id, title, filepath, metadata_path, metadata)'
+        """
+        rows = self.conn.execute(
+            'SELECT id, title, filepath, metadata_path, metadata FROM albums'
+        )
+        return [(*row[:4], json.loads(row[4])) for row in rows]
+
+    def put_album(self, id: str, title: str, filepath: str, metadata_path: str,
+                  metadata: dict, photo_ids: t.Iterable[str]):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO albums VALUES (?, ?, ?, ?, ?)',
+            (id, title, filepath, metadata_path, json.dumps(metadata, ensure_ascii=False))
+        )
+        self.conn.execute('DELETE FROM album_photos WHERE album_id = ?', (id,))
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO album_photos VALUES (?, ?)',
+            ((id, photo_id) for photo_id in photo_ids)
+        )
+
+    def remove_album(self, id: str):
+        self.conn.execute('DELETE FROM albums WHERE id = ?', (id,))
+        self.conn.execute('DELETE FROM album_photos WHERE album_id = ?', (id,))
+
+    def add_album_photo(self, album_id: str, photo_id: str):
+        self.conn.execute(
+            'INSERT OR IGNORE INTO album_photos VALUES (?, ?)', (album_id, photo_id)
+        )
+
+    def get_album_photo_ids(self) -> t.Dict[str, t.List[str]]:
+        photo_ids = {}
+        for album_id, photo_id in self.conn.execute(
+                'SELECT album_id, photo_id FROM album_photos ORDER BY rowid'):
+            photo_ids.setdefault(album_id, []).append(photo_id)
+        return photo_ids
+
+    # Sync state
+    def get_album_sync(self) -> t.Dict[str, t.Tuple[str, str]]:
+        """
+        Return '{album_id: (media_items_count, cover_photo_id)}' of the last sync
+        """
+        return {
+            album_id: (count, cover_id) for album_id, count, cover_id in
+            self.conn.execute(
+                'SELECT album_id, media_items_count, cover_photo_id FROM album_sync'
+            )
+        }
+
+    def put_album_sync(self, album_id: str, media_items_count: str,
+                       cover_photo_id: str, synced_at: float):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO album_sync VALUES (?, ?, ?, ?, ?)',
+            (album_id, media_items_count, cover_photo_id, synced_at, synced_at)
+        )
+
+    def touch_album_sync(self, album_id: str, seen_at: float):
+        self.conn.execute(
+            'UPDATE album_sync SET last_seen = ? WHERE album_id = ?', (seen_at, album_id)
+        )
+
+    # Photos
+    def get_photos(self) -> t.List[t.Tuple[str, str, str, str, t.Optional[str]]]:
+        """
+        Return a list of tuple '(id, filename, filepath, metadata_path, sha256)'
+        """
+        return self.conn.execute(
+            'SELECT id, filename, filepath, metadata_path, sha256 FROM photos'
+        ).fetchall()
+
+    def put_photo(self, id: str, filename: str, filepath: str, metadata_path: str,
+                  sha256: str=None):
+        try:
+            stat = os.stat(filepath)
+            size, mtime = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size, mtime = None, None
+        # Keep the known digest when the photo is re-indexed without one
+        self.conn.execute(
+            'INSERT OR REPLACE INTO photos VALUES (?, ?, ?, ?, ?, ?, '
+            'COALESCE(?, (SELECT sha256 FROM photos WHERE id = ?)))',
+            (id, filename, filepath, metadata_path, size, mtime, sha256, id)
+        )
+
+    def remove_photos(self, ids: t.Iterable[str]):
+        self.conn.executemany('DELETE FROM photos WHERE id = ?', ((id,) for id in ids))
@@ -0,0 +1,151 @@
+import json
+import os
+import typing as t
+
+
+class LinkBackend:
+    """
+    Create and resolve the links of an album folder to the real photo files
+    """
+    name = ''
+    suffix = ''
+
+    def link_name(self, target: str) -> str:
+        return os.path.basename(target) + self.suffix
+
+    def create_link(self, target: str, link_path: str):
+        raise NotImplementedError
+
+    def create_links(self, links: t.Iterable[t.Tuple[str, str]]):
+        """
+        Create many links, a list of tuple '(target, link_path)'
+        """
+        for target, link_path in links:
+            self.create_link(target, link_path)
+
+    def resolve(self, link_path: str) -> str:
+        raise NotImplementedError
+
+    def list_links(self, folder: str) -> t.List[t.Tuple[str, str]]:
+        """
+        Return a list of tuple '(link_path, target)' of the folder, sorted by name
+        """
+        links = []
+        for dir in sorted(os.listdir(folder)):
+            # Skip album metadata and pending writes
+            if dir.endswith('.json') or dir.endswith('.tmp'):
+                continue
+            link_path = os.path.join(folder, dir)
+            links.append((link_path, self.resolve(link_path)))
+        return links
+
+
+class ShortcutLinkBackend(LinkBackend):
+    """
+    Windows shortcuts (.lnk) through the WScript.Shell COM object
+    """
+    name = 'shortcut'
+    suffix = '.lnk'
+
+    def __init__(self):
+        # Imported here, win32com is only available on Windows
+        from .shortcut import ShortCut
+        self.shortcut_tool = ShortCut()
+
+    def create_link(self, target: str, link_path: str):
+        self.shortcut_tool.create_shortcut(target, link_path)
+
+    def resolve(self, link_path: str) -> str:
+        return self.shortcut_tool.get_target_path(link_path)
+
+
+class SymlinkBackend(LinkBackend):
+    """
+    Relative symlinks, the backup root can be moved or mounted elsewhere
+    """
+    name = 'symlink'
+
+    def create_link(self, target: str, link_path: str):
+        folder = os.path.dirname(os.path.abspath(link_path))
+        os.symlink(os.path.relpath(target, folder), link_path)
+
+    def resolve(self, link_path: str) -> str:
+        target = os.readlink(link_path)
+        folder = os.path.dirname(os.path.abspath(link_path))
+        return os.path.normpath(os.path.join(folder, target))
+
+
+class ManifestBackend(LinkBackend):
+    """
+    No links on the disk, a single manifest per album maps link names to targets.
+    Works on any filesystem and loads an album with one file read.
+    """
+    name = 'manifest'
+    manifest_name = '.links.json'
+
+    def __init__(self):
+        self._manifests: t.Dict[str, dict] = {}
+
+    def _manifest_path(self, folder: str) -> str:
+        return os.path.join(folder, self.manifest_name)
+
+    def _load(self, folder: str) -> dict:
+        folder = os.path.abspath(folder)
+        if folder not in self._manifests:
+            manifest_path = self._manifest_path(folder)
+            if os.path.exists(manifest_path):
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    self._manifests[folder] = json.load(f)
+            else:
+                self._manifests[folder] = {}
+        return self._manifests[folder]
+
+    def _save(self, folder: str):
+        folder = os.path.abspath(folder)
+        manifest_path = self._manifest_path(folder)
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._manifests[folder], f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def create_link(self, target: str, link_path: str):
+        folder, name = os.path.split(os.path.abspath(link_path))
+        self._load(folder)[name] = os.path.relpath(target, folder)
+        self._save(folder)
+
+    def create_links(self, links: t.Iterable[t.Tuple[str, str]]):
+        # Write every touched manifest once
+        folders = set()
+        for target, link_path in links:
+            folder, name = os.path.split(os.path.abspath(link_path))
+            self._load(folder)[name] = os.path.relpath(target, folder)
+            folders.add(folder)
+        for folder in folders:
+            self._save(folder)
+
+    def resolve(self, link_path: str) -> str:
+        folder, name = os.path.split(os.path.abspath(link_path))
+        return os.path.normpath(os.path.join(folder, self._load(folder)[name]))
+
+    def list_links(self, folder: str) -> t.List[t.Tuple[str, str]]:
+        folder = os.path.abspath(folder)
+        return [(os.path.join(folder, name), os.path.normpath(os.path.join(folder, target)))
+                for name, target in sorted(self._load(folder).items())]
+
+
+LINK_BACKENDS = {
+    backend.name: backend
+    for backend in (ShortcutLinkBackend, SymlinkBackend, ManifestBackend)
+}
+
+
+def get_link_backend(name: str=None) -> LinkBackend:
+    """
+    Create a link backend by name, default to shortcuts on Windows and
+    symlinks elsewhere
+    """
+    if name is None:
+        name = ShortcutLinkBackend.name if os.name == 'nt' else SymlinkBackend.name
+    if name not in LINK_BACKENDS:
+        raise ValueError(f'Unknown link backend {name}, expect one of {list(LINK_BACKENDS)}')
+    return LINK_BACKENDS[name]()
@@ -0,0 +1,125 @@
+import errno
+import os
+import shutil
+import sys
+
+MOVE = 'move'
+HARDLINK = 'hardlink'
+REFLINK = 'reflink'
+COPY = 'copy'
+AUTO = 'auto'
+
+STRATEGIES = (MOVE, HARDLINK, REFLINK, COPY, AUTO)
+
+# linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+def place_file(src: str, dst: str, strategy: str=COPY) -> str:
+    """
+    Place src on dst with the cheapest operation allowed by the strategy
+
+    Args:
+        - strategy:
+            'move': rename src to dst, copy and remove across filesystems
+            'hardlink': link dst to the src inode, copy if linking fails
+            'reflink': copy-on-write clone of src, copy if unsupported
+            'copy': in-kernel copy (copy_file_range) with a plain copy fallback
+            'auto': reflink or hardlink on the same filesystem, copy otherwise
+    Return:
+        the operation actually used
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown placement strategy {strategy}, expect one of {STRATEGIES}')
+
+    if strategy == MOVE:
+        try:
+            os.rename(src, dst)
+            return MOVE
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        _copy(src, dst)
+        os.remove(src)
+        return COPY
+
+    if strategy == AUTO:
+        if not _same_device(src, dst):
+            _copy(src, dst)
+            return COPY
+        if _reflink(src, dst):
+            return REFLINK
+        if _hardlink(src, dst):
+            return HARDLINK
+    elif strategy == HARDLINK:
+        if _hardlink(src, dst):
+            return HARDLINK
+    elif strategy == REFLINK:
+        if _reflink(src, dst):
+            return REFLINK
+
+    _copy(src, dst)
+    return COPY
+
+
+def _same_device(src: str, dst: str) -> bool:
+    dst_folder = os.path.dirname(os.path.abspath(dst))
+    return os.stat(src).st_dev == os.stat(dst_folder).st_dev
+
+
+def _hardlink(src: str, dst: str) -> bool:
+    try:
+        os.link(src, dst)
+        return True
+    except OSError as e:
+        if e.errno == errno.EEXIST:
+            raise
+        return False
+
+
+def _reflink(src: str, dst: str) -> bool:
+    if not sys.platform.startswith('linux'):
+        return False
+
+    import fcntl
+
+    with open(src, 'rb') as fsrc:
+        # 'x' keeps the same semantic as os.link when dst exists
+        with open(dst, 'xb') as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                return True
+            except OSError:
+                pass
+    os.remove(dst)
+    return False
+
+
+def _copy(src: str, dst: str):
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is None:
+        shutil.copyfile(src, dst)
+        return
+
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        offset = 0
+        try:
+            while offset < size:
+                copied = copy_file_range(fsrc.fileno(), fdst.fileno(), size - offset)
+                if copied == 0:
+                    break
+                offset += copied
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+            # Not supported between these files, let shutil pick sendfile or read/write
+            fdst.seek(0)
+            fdst.truncate()
+            fsrc.seek(0)
+            shutil.copyfileobj(fsrc, fdst)
+            return
+
+    if offset < size:
+        # The file shrank or the kernel stopped early, finish with a plain copy
+        shutil.copyfile(src, dst)
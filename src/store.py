@@ -0,0 +1,77 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import typing as t
+
+from .placement import COPY, MOVE, place_file
+
+
+class ContentStore:
+    """
+    Content-addressed blob store. Every file is kept once under
+    '<root>/.store/<first 2 hex>/<digest>' and placed in the backup
+    folders as a hardlink, so identical content shares the same disk blocks.
+    """
+    folder = '.store'
+    chunk_size = 1 << 20
+
+    def __init__(self, root: str, algorithm: str='sha256'):
+        self.root = os.path.join(root, self.folder)
+        self.algorithm = algorithm
+        if not os.path.exists(self.root):
+            os.makedirs(self.root)
+
+    def hash_file(self, path: str) -> str:
+        digest = hashlib.new(self.algorithm)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def blob_path(self, digest: str) -> str:
+        # Keyed by content only, 'a.JPG' and 'b.jpeg' of the same bytes share a blob
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, src: str, placement: str=COPY) -> t.Tuple[str, str]:
+        """
+        Add the file into the store, skip copying if the content is already stored
+
+        Args:
+            - placement: how src is placed into the store, see `place_file`
+        Return:
+            a tuple '(digest, blob_path)'
+        """
+        digest = self.hash_file(src)
+        blob_path = self.blob_path(digest)
+        if os.path.exists(blob_path):
+            if placement == MOVE:
+                os.remove(src)
+            return digest, blob_path
+
+        folder = os.path.dirname(blob_path)
+        if not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+
+        # Place to a temp file first, so a crash never leaves a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        os.close(fd)
+        os.remove(tmp_path)
+        try:
+            place_file(src, tmp_path, placement)
+            os.replace(tmp_path, blob_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, blob_path
+
+    @staticmethod
+    def link(blob_path: str, dst: str):
+        """
+        Place the blob on dst as a hardlink, copy if the filesystem can't link
+        """
+        try:
+            os.link(blob_path, dst)
+        except OSError:
+            shutil.copyfile(blob_path, dst)
@@ -0,0 +1,100 @@
+import time
+import typing as t
+
+from .agent.bulk import BulkDownloader
+from .agent.models import AlbumModel
+from .agent.photo import GooglePhotoClient
+from .backup import BackupManager
+
+
+class SyncStats:
+    def __init__(self):
+        self.albums = 0
+        self.changed_albums = 0
+        self.listed_items = 0
+        self.downloaded = 0
+        self.failed = 0
+
+    def __str__(self):
+        return (f"albums: {self.albums}, changed: {self.changed_albums}, "
+                f"listed items: {self.listed_items}, downloaded: {self.downloaded}, "
+                f"failed: {self.failed}")
+
+
+class AlbumSync:
+    """
+    Incremental sync of Google Photos albums into a backup.
+
+    The album listing is always fetched, but an album is only re-listed when its
+    'mediaItemsCount' or cover photo changed since the last successful sync, and
+    only media ids missing from the backup are downloaded.
+
+    Args:
+        - client: photo client
+        - manager: backup manager, it must use the index to keep the sync state
+        - downloader: bulk downloader of the missing media
+    """
+
+    def __init__(self,
+                 client: GooglePhotoClient,
+                 manager: BackupManager,
+                 downloader: BulkDownloader):
+        if manager.index is None:
+            raise RuntimeError('Incremental sync needs a BackupManager with use_index=True')
+        self.client = client
+        self.manager = manager
+        self.downloader = downloader
+
+    def sync(self, force: bool=False) -> SyncStats:
+        """
+        Sync all albums
+
+        Args:
+            - force: re-list every album even if it looks unchanged
+        """
+        stats = SyncStats()
+        index = self.manager.index
+        sync_state = index.get_album_sync()
+
+        for album in self.client.iter_all_albums():
+            stats.albums += 1
+            now = time.time()
+            state = (album.mediaItemsCount, album.coverPhotoMediaItemId)
+            if (not force and sync_state.get(album.id) == state
+                    and self.manager.check_album_existed(album.id)):
+                index.touch_album_sync(album.id, now)
+                continue
+
+            stats.changed_albums += 1
+            if self.sync_album(album, stats):
+                index.put_album_sync(album.id, *state, now)
+            index.commit()
+
+        return stats
+
+    def sync_album(self, album: AlbumModel, stats: SyncStats=None) -> bool:
+        """
+        List the album, download the missing media and back them up.
+        Return whether every item of the album is now backed up.
+        """
+        stats = stats or SyncStats()
+        items = list(self.client.iter_photo_in_albums(album))
+        stats.listed_items += len(items)
+
+        missing = [model for model in items if not self.manager.check_photo_existed(model.id)]
+        downloaded = dict(
+            (model.id, path) for model, path in self.downloader.download(missing)
+        )
+        stats.downloaded += len(downloaded)
+        stats.failed += len(missing) - len(downloaded)
+
+        # Photos already backed up don't need a source file
+        photo_list: t.List[t.Tuple] = []
+        for model in items:
+            if self.manager.check_photo_existed(model.id):
+                photo_list.append((model, None))
+            elif model.id in downloaded:
+                photo_list.append((model, downloaded[model.id]))
+
+        self.manager.backup_album(album, photo_list)
+        return len(photo_list) == len(items)
@@ -0,0 +1,102 @@
+import asyncio
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from agent.aio.client import AsyncHttpClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    calls = {}
+
+    def do_GET(self):
+        count = Handler.calls.get(self.path, 0) + 1
+        Handler.calls[self.path] = count
+        if self.path in ("/slow", "/stall"):
+            return self.stream_body(count)
+        if self.path == "/flaky" and count == 1:
+            status, body = 429, b""
+        elif self.path == "/missing":
+            status, body = 404, b'{"error": {"code": 404, "message": "not found"}}'
+        else:
+            status, body = 200, self.path.encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_body(self, count):
+        # 4000 bytes in 4 parts, "/stall" hangs after the first half once
+        self.send_response(200)
+        self.send_header("Content-Length", "4000")
+        self.end_headers()
+        for i in range(4):
+            self.wfile.write(bytes([ord("a") + i]) * 1000)
+            self.wfile.flush()
+            if self.path == "/stall" and count == 1 and i == 1:
+                time.sleep(0.6)
+                return
+            time.sleep(0.15)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_concurrent_requests_and_retry(server):
+    async def run():
+        async with AsyncHttpClient(max_concurrency=4, backoff_factor=0) as client:
+            paths = ["/flaky"] + [f"/item/{i}" for i in range(10)]
+            return await asyncio.gather(
+                *(client._request("GET", server + p, "error") for p in paths)
+            )
+
+    bodies = asyncio.run(run())
+    assert bodies[0] == b"/flaky"
+    assert bodies[1:] == [f"/item/{i}".encode() for i in range(10)]
+    assert Handler.calls["/flaky"] == 2
+
+
+def test_error_message(server):
+    async def run():
+        async with AsyncHttpClient() as client:
+            await client._request("GET", server + "/missing", "Failed")
+
+    with pytest.raises(RuntimeError, match="Failed, code: 404, message: not found"):
+        asyncio.run(run())
+
+
+def test_stream_longer_than_timeout(server):
+    async def run():
+        fd = io.BytesIO()
+        async with AsyncHttpClient(timeout=0.4, backoff_factor=0) as client:
+            await client._request("GET", server + "/slow", "error", fd=fd)
+        return fd.getvalue()
+
+    # 0.6s in total, but never 0.4s without data
+    assert asyncio.run(run()) == b"a" * 1000 + b"b" * 1000 + b"c" * 1000 + b"d" * 1000
+
+
+def test_stream_retry_rewinds(server):
+    async def run(fd):
+        async with AsyncHttpClient(timeout=0.3, backoff_factor=0) as client:
+            await client._request("GET", server + "/stall", "error", fd=fd)
+
+    fd = io.BytesIO(b"head")
+    fd.seek(4)
+    asyncio.run(run(fd))
+    assert fd.getvalue() == b"head" + b"a" * 1000 + b"b" * 1000 + b"c" * 1000 + b"d" * 1000
+    assert Handler.calls["/stall"] == 2
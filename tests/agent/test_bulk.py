@@ -0,0 +1,117 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent.bulk import BULK_RETRY_STATUS, BulkDownloader, Throttle
+from agent.client import HttpClient
+from agent.models import MediaItemModel
+from agent.photo import GooglePhotoClient
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    data = bytes(range(256)) * 100
+    calls = {}
+    ranges = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        name = self.path.split("/")[1].split("=")[0]
+        with MediaHandler.lock:
+            count = MediaHandler.calls.get(name, 0) + 1
+            MediaHandler.calls[name] = count
+        if name == "missing":
+            return self.send_body(404, b'{"error": {"code": 404, "message": "gone"}}')
+        if name == "busy" and count == 1:
+            return self.send_body(429, b"")
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header:
+            start = int(range_header[len("bytes="):].rstrip("-"))
+            MediaHandler.ranges.append((name, start))
+        headers = {}
+        if start:
+            headers["Content-Range"] = f"bytes {start}-{len(self.data) - 1}/{len(self.data)}"
+        self.send_body(206 if start else 200, self.data[start:], headers)
+
+    def send_body(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    MediaHandler.calls = {}
+    MediaHandler.ranges = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MediaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def make_client(server, monkeypatch):
+    client = GooglePhotoClient.__new__(GooglePhotoClient)
+    HttpClient.__init__(client, backoff_factor=0, retry_status=BULK_RETRY_STATUS)
+    # Retries ask for a fresh base url
+    monkeypatch.setattr(client, "get_photo", lambda id: make_item(server, id))
+    return client
+
+
+def make_item(server, id):
+    return MediaItemModel.parse_obj(
+        {"id": id, "filename": f"{id}.jpg", "baseUrl": f"{server}/{id}"}
+    )
+
+
+def test_bulk_download(server, tmp_path, monkeypatch):
+    folder = tmp_path / "download"
+    downloader = BulkDownloader(make_client(server, monkeypatch), str(folder), max_workers=4)
+    downloader.throttle = Throttle(initial=0.01)
+    folder.joinpath("present_present.jpg").write_bytes(b"already here")
+    folder.joinpath("partial_partial.jpg.part").write_bytes(MediaHandler.data[:1000])
+
+    names = ["present", "partial", "busy", "missing"] + [f"item{i}" for i in range(6)]
+    items = [make_item(server, name) for name in names]
+    results = downloader.download(items)
+
+    # Failed items are left out, the rest keeps the input order
+    assert [model.id for model, _ in results] == [n for n in names if n != "missing"]
+    for model, path in results:
+        assert path == os.path.join(str(folder), f"{model.id}_{model.id}.jpg")
+    assert not [name for name in os.listdir(folder) if name.endswith(".part")]
+
+    # Already present, never requested
+    assert "present" not in MediaHandler.calls
+    assert folder.joinpath("present_present.jpg").read_bytes() == b"already here"
+    # Resumed from the .part file
+    assert MediaHandler.ranges == [("partial", 1000)]
+    assert folder.joinpath("partial_partial.jpg").read_bytes() == MediaHandler.data
+    # 429 reaches the throttle at once, which slows down and retries
+    assert MediaHandler.calls["busy"] == 2
+    assert folder.joinpath("busy_busy.jpg").read_bytes() == MediaHandler.data
+
+    stats = downloader.stats
+    assert (stats.done, stats.skipped, stats.failed, stats.throttled) == (8, 1, 1, 1)
+    assert stats.bytes == len(MediaHandler.data) * 8 - 1000
+
+
+def test_throttle():
+    throttle = Throttle(initial=0.5, maximum=2, decay=0.25)
+    throttle.slow_down()
+    assert throttle.delay == 0.5
+    throttle.slow_down()
+    throttle.slow_down()
+    throttle.slow_down()
+    assert throttle.delay == 2
+    throttle.speed_up()
+    assert throttle.delay == 1.75
@@ -0,0 +1,148 @@
+import time
+
+import agent.maps
+from agent.cache import MemoryCache, SQLiteCache, TieredCache, make_key
+from agent.maps import GoogleMapsClient
+from agent.streetview_cache import (
+    StreetViewCache, geohash_bounds, geohash_encode, geohash_neighbors
+)
+
+
+class FakeResponse:
+    ok = True
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+
+def test_make_key_is_normalized():
+    key = make_key("streetview", {"heading": 90.0, "location": " 1,2", "key": "a"})
+    assert key == make_key("streetview", {"location": "1,2", "key": "b", "heading": 90})
+    assert key != make_key("directions", {"heading": 90, "location": "1,2"})
+
+
+def test_memory_cache_lru():
+    cache = MemoryCache(max_items=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.set("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+
+    cache = MemoryCache(max_bytes=4)
+    cache.set("a", b"12")
+    cache.set("b", b"345")
+    assert cache.get("a") is None
+    assert cache.size == 3
+
+
+def test_sqlite_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SQLiteCache(path, max_bytes=6)
+    cache.set("a", b"123")
+    cache.set("old", b"x", ttl=-1)
+    cache.set("b", b"456")
+    assert cache.get("old") is None
+    assert cache.get("a") == b"123"
+    # "b" is now the least recently used
+    time.sleep(0.01)
+    cache.set("c", b"789")
+    assert cache.get("b") is None
+    cache.close()
+
+    cache = SQLiteCache(path)
+    assert cache.get("a") == b"123"
+    assert cache.get("c") == b"789"
+    cache.close()
+
+
+def test_maps_client_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(agent.maps, "load_api_key", lambda: "secret")
+    calls = []
+
+    def fake_get(url, **kwargs):
+        calls.append(kwargs["params"])
+        if "directions" in url:
+            return FakeResponse(b'{"status": "OVER_QUERY_LIMIT"}')
+        return FakeResponse(b"jpeg")
+
+    cache = TieredCache(MemoryCache(), SQLiteCache(str(tmp_path / "maps.sqlite")))
+    with GoogleMapsClient(cache=cache) as client:
+        monkeypatch.setattr(client, "_get", fake_get)
+        assert client.download_streetview_image(1.0, 2.0, 90) == b"jpeg"
+        assert client.download_streetview_image(1.0, 2.0, 90.0) == b"jpeg"
+        assert len(calls) == 1
+        # Error statuses are not cached
+        client.get_directions("a", "b")
+        client.get_directions("a", "b")
+        assert len(calls) == 3
+
+
+def test_geohash():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds("u4pruydqqvj")
+    assert lat_min <= 57.64911 <= lat_max and lng_min <= 10.40744 <= lng_max
+    neighbors = geohash_neighbors("u4pruydqqvj")
+    assert len(neighbors) == 9 and "u4pruydqqvj" in neighbors
+
+
+def test_streetview_cache(tmp_path):
+    cache = StreetViewCache(str(tmp_path / "streetview.sqlite"), max_distance=4,
+                            heading_tolerance=5)
+    cache.put(40.0, -74.0, 359.0, b"north", "640x400")
+    cache.put(40.0, -74.0, 90.0, b"east", "640x400")
+    # About 2 m away and across the 0/360 wrap
+    assert cache.get(40.00002, -74.0, 2.0, "640x400") == b"north"
+    assert cache.get(40.0, -74.00001, 93.0, "640x400") == b"east"
+    assert cache.get(40.0, -74.0, 10.0, "640x400") is None
+    assert cache.get(40.001, -74.0, 0.0, "640x400") is None
+    assert cache.get(40.0, -74.0, 0.0, "320x200") is None
+    cache.close()
+
+
+def test_streetview_cache_scans_max_distance(tmp_path):
+    cache = StreetViewCache(str(tmp_path / "streetview.sqlite"), max_distance=15)
+    cache.put(40.0, -74.0, 0.0, b"far", "640x400")
+    # About 11 m north, over two precision 9 cells away
+    assert cache.get(40.0 - 11 / 111195, -74.0, 0.0, "640x400") == b"far"
+    cache.close()
+
+    # Cells are half as wide at 60N, start from the east edge of one
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(geohash_encode(60.0, 10.0, 9))
+    lat, lng = (lat_min + lat_max) / 2, lng_max - 1e-7
+    cache = StreetViewCache(str(tmp_path / "north.sqlite"), max_distance=4)
+    cache.put(lat, lng + 3.5 / (111195 * 0.5), 90.0, b"east", "640x400")
+    assert cache.get(lat, lng, 90.0, "640x400") == b"east"
+    cache.close()
+
+
+def test_streetview_cache_evicts_least_recently_used(tmp_path):
+    cache = StreetViewCache(str(tmp_path / "streetview.sqlite"), max_bytes=10)
+    cache.put(40.0, -74.0, 0.0, b"aaaa")
+    cache.put(41.0, -74.0, 0.0, b"bbbb")
+    time.sleep(0.01)
+    assert cache.get(40.0, -74.0, 0.0) == b"aaaa"
+    cache.put(42.0, -74.0, 0.0, b"cccc")
+    assert len(cache) == 2
+    assert cache.get(41.0, -74.0, 0.0) is None
+    assert cache.get(40.0, -74.0, 0.0) == b"aaaa"
+    cache.close()
+
+
+def test_maps_client_stores_frames_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(agent.maps, "load_api_key", lambda: "secret")
+    calls = []
+
+    def fake_get(url, **kwargs):
+        calls.append(kwargs["params"])
+        return FakeResponse(b"jpeg")
+
+    cache = MemoryCache()
+    streetview_cache = StreetViewCache(str(tmp_path / "streetview.sqlite"))
+    with GoogleMapsClient(cache=cache, streetview_cache=streetview_cache) as client:
+        monkeypatch.setattr(client, "_get", fake_get)
+        assert client.download_streetview_image(1.0, 2.0, 90) == b"jpeg"
+        assert client.download_streetview_image(1.0, 2.0, 90) == b"jpeg"
+        assert len(calls) == 1
+        assert cache.size == 0
@@ -0,0 +1,64 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from agent.client import HttpClient
+from agent.ratelimit import TokenBucket
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    calls = 0
+
+    def do_GET(self):
+        FlakyHandler.calls += 1
+        if FlakyHandler.calls == 1:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_session_is_pooled():
+    client = HttpClient(pool_connections=2, pool_maxsize=8, max_retries=5)
+    adapter = client.session.get_adapter("https://example.com")
+    assert adapter._pool_maxsize == 8
+    assert adapter.max_retries.total == 5
+    assert 429 in adapter.max_retries.status_forcelist
+
+
+def test_retry_on_5xx():
+    server = HTTPServer(("127.0.0.1", 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with HttpClient(backoff_factor=0) as client:
+            ret = client._get(f"http://127.0.0.1:{server.server_port}/")
+        assert ret.ok
+        assert ret.json() == {"ok": True}
+        assert FlakyHandler.calls == 2
+    finally:
+        server.shutdown()
+
+
+def test_retry_takes_rate_limit_token():
+    FlakyHandler.calls = 0
+    server = HTTPServer(("127.0.0.1", 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        rate_limit = TokenBucket(rate=0)
+        with HttpClient(backoff_factor=0, rate_limit=rate_limit) as client:
+            assert client._get(f"http://127.0.0.1:{server.server_port}/").ok
+        # The 503 and its retry each took a token
+        assert FlakyHandler.calls == 2
+        assert rate_limit.acquired == 2
+    finally:
+        server.shutdown()
@@ -1,9 +1,61 @@
 import json
 
-from agent.models import DirectionsModel
+import pydantic
+import pytest
+
+from agent.models import (
+    DirectionsModel,
+    LazyDirectionsModel,
+    LiteDirectionsModel,
+    LiteMediaItemModel,
+    MediaItemModel,
+)
 
 def test_direction_model():
     with open("tests/agent/samples/directions_response.json", "r") as f:
         response = json.load(f)
 
     DirectionsModel.parse_obj(response)
+
+
+def test_lite_models_match_pydantic():
+    with open("tests/agent/samples/directions_response.json", "r") as f:
+        response = json.load(f)
+
+    lite = LiteDirectionsModel.parse_obj(response)
+    assert lite.dict() == DirectionsModel.parse_obj(response).dict()
+    assert lite.routes[0].overview_polyline.points == response["routes"][0]["overview_polyline"]["points"]
+
+    item = {"id": "1", "filename": "a.jpg", "mediaMetadata": {"width": "10"}, "unknown": 1}
+    assert LiteMediaItemModel.parse_obj(item).dict() == MediaItemModel.parse_obj(item).dict()
+
+
+def test_lazy_directions_model():
+    with open("tests/agent/samples/directions_response.json", "r") as f:
+        response = json.load(f)
+
+    directions = LazyDirectionsModel.parse_obj(response)
+    leg = directions.routes[0].legs[0]
+    # Steps stay as the original JSON
+    assert leg.steps is response["routes"][0]["legs"][0]["steps"]
+    assert directions.routes[0].overview_polyline.points == response["routes"][0]["overview_polyline"]["points"]
+    assert directions.dict() == DirectionsModel.parse_obj(response).dict()
+
+    with pytest.raises(pydantic.ValidationError):
+        LazyDirectionsModel.parse_obj({"status": {"not": "a string"}}).status
+
+
+@pytest.mark.parametrize("response, path, loc", [
+    ({"routes": {"legs": []}}, ["routes"], ("routes",)),
+    ({"routes": [["not", "a dict"]]}, ["routes"], ("routes", 0)),
+    ({"routes": [{"legs": [{"distance": [1]}]}]},
+     ["routes", 0, "legs", 0, "distance"], ("routes", 0, "legs", 0, "distance")),
+    ({"routes": [{"overview_polyline": {"points": ["x"]}}]},
+     ["routes", 0, "overview_polyline", "points"], ("routes", 0, "overview_polyline", "points")),
+])
+def test_lazy_model_errors_name_the_field(response, path, loc):
+    value = LazyDirectionsModel.parse_obj(response)
+    with pytest.raises(pydantic.ValidationError) as e:
+        for step in path:
+            value = value[step] if isinstance(step, int) else getattr(value, step)
+    assert e.value.errors()[0]["loc"] == loc
@@ -0,0 +1,103 @@
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from agent.client import HttpClient
+from agent.models import AlbumModel
+from agent.photo import GooglePhotoClient
+
+PAGES = {
+    None: {"albums": [{"id": "1"}, {"id": "2"}], "nextPageToken": "a"},
+    "a": {"nextPageToken": "b"},
+    "b": {"albums": [{"id": "3"}]},
+}
+
+
+def test_iter_pages_is_lazy():
+    requested = []
+
+    def fetch_page(token):
+        requested.append(token)
+        return PAGES[token]
+
+    pages = GooglePhotoClient._iter_pages(fetch_page, "albums", AlbumModel, prefetch=False)
+    assert requested == []
+    assert next(pages).id == "1"
+    assert requested == [None]
+    assert [album.id for album in pages] == ["2", "3"]
+    assert requested == [None, "a", "b"]
+
+
+def test_iter_pages_prefetch():
+    pages = GooglePhotoClient._iter_pages(PAGES.get, "albums", AlbumModel)
+    assert [album.id for album in pages] == ["1", "2", "3"]
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    data = bytes(range(256)) * 1000
+
+    def do_GET(self):
+        start = 0
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header:
+            start = int(range_header[len("bytes="):].rstrip("-"))
+            status = 206
+            if "misaligned" in self.path:
+                # Answers a range other than the one requested
+                start = max(0, start - 500)
+        body = self.data[start:]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 206:
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(self.data) - 1}/{len(self.data)}"
+            )
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def media_url():
+    server = HTTPServer(("127.0.0.1", 0), MediaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/media"
+    server.shutdown()
+
+
+def make_client():
+    client = GooglePhotoClient.__new__(GooglePhotoClient)
+    HttpClient.__init__(client)
+    return client
+
+
+def test_download_photo_streams_in_chunks(media_url):
+    fd = io.BytesIO()
+    written = make_client().download_photo(fd, baseUrl=media_url, chunk_size=4096)
+    assert written == len(MediaHandler.data)
+    assert fd.getvalue() == MediaHandler.data
+
+
+def test_download_photo_resume(media_url, tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(MediaHandler.data[:1000])
+
+    size = make_client().download_photo_to_file(str(path), baseUrl=media_url)
+    assert size == len(MediaHandler.data)
+    assert path.read_bytes() == MediaHandler.data
+
+
+def test_download_photo_restarts_on_misaligned_range(media_url, tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(MediaHandler.data[:1000])
+
+    url = media_url.replace("/media", "/misaligned")
+    size = make_client().download_photo_to_file(str(path), baseUrl=url)
+    assert size == len(MediaHandler.data)
+    assert path.read_bytes() == MediaHandler.data
@@ -0,0 +1,45 @@
+import threading
+import time
+
+import pytest
+
+from agent.pipeline import ordered_map
+
+
+def test_ordered_map_keeps_order():
+    def work(i):
+        # Later items finish first
+        time.sleep(0.01 * (5 - i % 5))
+        return i * i
+
+    assert list(ordered_map(work, range(20), max_workers=4)) == [i * i for i in range(20)]
+
+
+def test_ordered_map_window():
+    lock = threading.Lock()
+    state = {"submitted": 0, "max_ahead": 0}
+
+    def items():
+        for i in range(50):
+            with lock:
+                state["submitted"] += 1
+            yield i
+
+    consumed = 0
+    for _ in ordered_map(lambda i: i, items(), max_workers=4, window=6):
+        consumed += 1
+        state["max_ahead"] = max(state["max_ahead"], state["submitted"] - consumed)
+    assert consumed == 50
+    assert state["max_ahead"] <= 6
+
+
+def test_ordered_map_error():
+    def work(i):
+        if i == 3:
+            raise RuntimeError("broken frame")
+        return i
+
+    results = ordered_map(work, range(10), max_workers=2)
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(RuntimeError):
+        next(results)
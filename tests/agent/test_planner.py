@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+import agent.maps
+from agent.maps import GoogleMapsClient, route_points
+from agent.planner import RoutePlanner
+from agent.route import decode_polyline, encode_polyline
+
+
+def fake_directions(stops):
+    """
+    A straight leg between every pair of stops, stops are "lat,lng" strings
+    """
+    points = [tuple(float(v) for v in stop.split(",")) for stop in stops]
+    legs = []
+    for start, end in zip(points, points[1:]):
+        legs.append({
+            "start_location": {"lat": start[0], "lng": start[1]},
+            "end_location": {"lat": end[0], "lng": end[1]},
+            "steps": [{"polyline": {"points": encode_polyline([start, end])}}],
+        })
+    lats, lngs = [p[0] for p in points], [p[1] for p in points]
+    return {
+        "geocoded_waypoints": [{"geocoder_status": "OK", "place_id": stop} for stop in stops],
+        "routes": [{
+            "bounds": {"northeast": {"lat": max(lats), "lng": max(lngs)},
+                       "southwest": {"lat": min(lats), "lng": min(lngs)}},
+            "legs": legs,
+            "overview_polyline": {"points": encode_polyline(points)},
+            "summary": "Main St",
+            "waypoint_order": list(range(len(stops) - 2)),
+        }],
+        "status": "OK",
+    }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(agent.maps, "load_api_key", lambda: "secret")
+    client = GoogleMapsClient()
+    client.requests = []
+    lock = threading.Lock()
+
+    def get_directions_json(origin, destination, waypoints=None):
+        with lock:
+            client.requests.append((origin, destination, list(waypoints or [])))
+        time.sleep(0.05)
+        return fake_directions([origin, *(waypoints or []), destination])
+
+    monkeypatch.setattr(client, "get_directions_json", get_directions_json)
+    return client
+
+
+def test_split():
+    planner = RoutePlanner(None, max_waypoints=2)
+    stops = [str(i) for i in range(8)]
+    assert planner.split(stops) == [["0", "1", "2", "3"], ["3", "4", "5", "6"], ["6", "7"]]
+    assert planner.split(stops[:4]) == [["0", "1", "2", "3"]]
+    with pytest.raises(ValueError):
+        planner.split(["0"])
+
+
+def test_plan(client):
+    stops = [f"{40 + i * 0.01:.2f},{-74 + i * 0.01:.2f}" for i in range(60)]
+    planner = RoutePlanner(client, max_waypoints=25)
+    start = time.monotonic()
+    directions = planner.plan(stops)
+    # Three segments requested at the same time
+    assert len(client.requests) == 3
+    assert time.monotonic() - start < 0.14
+
+    route = directions.routes[0]
+    assert len(route.legs) == len(stops) - 1
+    assert [wp.place_id for wp in directions.geocoded_waypoints] == stops
+    assert route.waypoint_order == list(range(len(stops) - 2))
+    assert route.bounds["southwest"] == {"lat": 40.0, "lng": -74.0}
+    assert route.bounds["northeast"] == pytest.approx({"lat": 40.59, "lng": -73.41})
+    assert len(decode_polyline(route.overview_polyline.points)) == len(stops)
+    assert len(route_points(route)) == len(stops)
+
+
+def test_plan_error(client, monkeypatch):
+    monkeypatch.setattr(client, "get_directions_json",
+                        lambda *args: {"status": "ZERO_RESULTS", "routes": []})
+    with pytest.raises(RuntimeError):
+        RoutePlanner(client).plan(["a", "b"])
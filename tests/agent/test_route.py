@@ -0,0 +1,71 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from agent.maps import route_points
+from agent.models import LazyDirectionsModel
+from agent.route import (
+    bearings, cumulative_distance, decode_polyline, encode_polyline, haversine, interpolate,
+    resample, segment_lengths
+)
+
+
+def test_haversine():
+    # One degree of latitude is about 111.2 km
+    assert haversine(0.0, 0.0, 1.0, 0.0) == pytest.approx(111195, rel=1e-3)
+    distances = haversine(np.zeros(3), np.zeros(3), np.zeros(3), np.array([0.0, 1.0, -1.0]))
+    assert distances[0] == 0 and distances[1] == pytest.approx(distances[2])
+
+
+def test_bearings():
+    points = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0), (0.0, 0.0)]
+    assert bearings(points) == pytest.approx([0.0, 90.0, 180.0, 270.0], abs=0.01)
+
+
+def test_interpolate():
+    points = interpolate([(0.0, 0.0), (1.0, 2.0), (2.0, 2.0)], 2)
+    assert points.tolist() == [[0.0, 0.0], [0.5, 1.0], [1.0, 2.0], [1.5, 2.0]]
+
+
+def test_resample_even_spacing():
+    # Uneven input with a repeated point
+    points = [(40.0, -74.0), (40.0, -74.0), (40.001, -74.0), (40.01, -74.0), (40.01, -73.99)]
+    resampled = resample(points, 25.0)
+    lengths = segment_lengths(resampled)
+    assert resampled[0].tolist() == [40.0, -74.0]
+    # Only the corner segment is shorter than the spacing
+    assert np.sum(np.abs(lengths - 25.0) > 0.5) <= 1
+    total = cumulative_distance(points)[-1]
+    assert len(resampled) == math.floor(total / 25.0) + 1
+
+
+def test_decode_polyline():
+    points = decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+    expected = [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]]
+    assert points.ravel().tolist() == pytest.approx(np.ravel(expected))
+    assert decode_polyline("").shape == (0, 2)
+    with pytest.raises(ValueError):
+        decode_polyline("_p~iF~ps|U_")
+
+
+def test_encode_polyline():
+    encoded = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    assert encode_polyline(decode_polyline(encoded)) == encoded
+    points = np.round(np.cumsum(np.random.default_rng(0).normal(0, 1, (1000, 2)), axis=0), 5)
+    assert np.abs(decode_polyline(encode_polyline(points)) - points).max() < 1e-9
+
+
+def test_route_points():
+    with open("tests/agent/samples/directions_response.json", "r") as f:
+        directions = LazyDirectionsModel.parse_obj(json.load(f))
+    route = directions.routes[0]
+    points = route_points(route)
+
+    overview = decode_polyline(route.overview_polyline.points)
+    assert len(points) > len(overview)
+    assert np.all(np.any(points[1:] != points[:-1], axis=1))
+    start, end = route.legs[0].start_location, route.legs[-1].end_location
+    assert points[0].tolist() == pytest.approx([start["lat"], start["lng"]], abs=1e-4)
+    assert points[-1].tolist() == pytest.approx([end["lat"], end["lng"]], abs=1e-4)
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+
+from agent.ratelimit import TokenBucket
+from agent.streetview import StreetViewDownloader, StreetViewFrame, StreetViewManifest
+
+
+class FakeMapsClient:
+    def __init__(self, rate_limit: TokenBucket):
+        self.rate_limit = rate_limit
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def download_streetview_image(self, lat: float, lng: float, heading: float) -> bytes:
+        self.rate_limit.acquire()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self._lock:
+            self.in_flight -= 1
+        if lat < 0:
+            raise RuntimeError("no imagery")
+        return f"{lat},{lng},{heading:.0f}".encode()
+
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(rate=100, burst=1)
+    start = time.monotonic()
+    for _ in range(21):
+        bucket.acquire()
+    # The first token is free, the next 20 take 10 ms each
+    assert time.monotonic() - start >= 0.18
+    assert bucket.acquired == 21
+
+
+def test_token_bucket_unlimited():
+    bucket = TokenBucket(rate=0)
+    for _ in range(1000):
+        bucket.acquire()
+    assert bucket.acquired == 1000
+
+
+def test_streetview_downloader(tmp_path):
+    client = FakeMapsClient(TokenBucket(rate=0))
+    downloader = StreetViewDownloader(client, str(tmp_path), max_workers=4)
+    frames = [StreetViewFrame(i, 1.0 + i, 2.0, 90.0) for i in range(8)]
+    frames.append(StreetViewFrame(8, -1.0, 2.0, 90.0))
+
+    results = downloader.download(frames)
+    assert [frame.index for frame, _ in results] == list(range(8))
+    assert client.max_in_flight > 1
+    assert downloader.stats.done == 8 and downloader.stats.failed == 1
+
+    frame, path = results[0]
+    assert os.path.basename(path) == "streetview_000_1.00000_2.00000.jpg"
+    with open(path, "rb") as f:
+        assert f.read() == b"1.0,2.0,90"
+    assert not any(name.endswith(".part") for name in os.listdir(tmp_path))
+
+
+def test_resume_with_manifest(tmp_path):
+    folder = str(tmp_path)
+    frames = [StreetViewFrame(i, 1.0 + i, 2.0, 90.0) for i in range(4)]
+    frames.append(StreetViewFrame(4, -1.0, 2.0, 90.0))
+
+    client = FakeMapsClient(TokenBucket(rate=0))
+    manifest = StreetViewManifest(folder)
+    StreetViewDownloader(client, folder, manifest=manifest).download(frames)
+    manifest.close()
+
+    records = StreetViewManifest(folder).load()
+    assert records[0]["status"] == "done" and records[0]["sha256"]
+    assert records[4]["status"] == "failed"
+
+    # A second shard resumes with its own manifest, only the failed frame is fetched
+    client = FakeMapsClient(TokenBucket(rate=0))
+    frames[4].lat = 5.0
+    manifest = StreetViewManifest(folder, "manifest_2_5.jsonl")
+    downloader = StreetViewDownloader(client, folder, manifest=manifest, verify=True)
+    results = downloader.download(frames[2:])
+    manifest.close()
+    assert len(results) == 3
+    assert downloader.stats.skipped == 2 and downloader.stats.done == 1
+    assert client.rate_limit.acquired == 1
+    assert StreetViewManifest(folder).load()[4]["status"] == "done"
+
+    # A changed heading or a corrupted file is downloaded again
+    with open(results[0][1], "wb") as f:
+        f.write(b"broken")
+    frames[3].heading = 180.0
+    downloader = StreetViewDownloader(client, folder, manifest=StreetViewManifest(folder),
+                                      verify=True)
+    downloader.download(frames)
+    assert downloader.stats.done == 2 and downloader.stats.skipped == 3
+
+
+def test_manifest_keeps_newest_record(tmp_path):
+    folder = str(tmp_path)
+    frame = StreetViewFrame(0, 1.0, 2.0, 90.0)
+    # Sorted by name, manifest_0_10 comes first but is written last
+    for name, status in (("manifest_0_100.jsonl", "failed"), ("manifest_0_10.jsonl", "done")):
+        manifest = StreetViewManifest(folder, name)
+        manifest.record(frame, status)
+        manifest.close()
+        time.sleep(0.01)
+    assert StreetViewManifest(folder).load()[0]["status"] == "done"
+
+
+def test_iter_images_in_order(tmp_path):
+    folder = str(tmp_path)
+    frames = [StreetViewFrame(i, 1.0 + i, 2.0, 90.0) for i in range(6)]
+    frames.append(StreetViewFrame(6, -1.0, 2.0, 90.0))
+    client = FakeMapsClient(TokenBucket(rate=0))
+
+    downloader = StreetViewDownloader(client, folder, max_workers=3, archive=False)
+    results = list(downloader.iter_images(frames, transform=lambda image, frame: len(image)))
+    assert [frame.index for frame, _ in results] == list(range(6))
+    assert results[1][1] == len(b"2.0,2.0,90")
+    assert downloader.stats.failed == 1
+    assert os.listdir(folder) == []
+
+    # Archived frames are read back from the disk on the next run
+    manifest = StreetViewManifest(folder)
+    downloader = StreetViewDownloader(client, folder, max_workers=3, manifest=manifest)
+    list(downloader.iter_images(frames[:3]))
+    manifest.close()
+    assert len(os.listdir(folder)) == 4
+    downloader = StreetViewDownloader(client, folder, manifest=StreetViewManifest(folder))
+    results = list(downloader.iter_images(frames[:4]))
+    assert [image for _, image in results][0] == b"1.0,2.0,90"
+    assert downloader.stats.skipped == 3 and downloader.stats.done == 1
+
+
+def test_iter_images_transform_failure_keeps_download(tmp_path):
+    folder = str(tmp_path)
+    frames = [StreetViewFrame(i, 1.0 + i, 2.0, 90.0) for i in range(3)]
+    client = FakeMapsClient(TokenBucket(rate=0))
+
+    def transform(image, frame):
+        if frame.index == 1:
+            raise ValueError("Can't decode")
+        return image
+
+    manifest = StreetViewManifest(folder)
+    downloader = StreetViewDownloader(client, folder, manifest=manifest)
+    results = list(downloader.iter_images(frames, transform=transform))
+    manifest.close()
+    assert [frame.index for frame, _ in results] == [0, 2]
+    assert downloader.stats.done == 3 and downloader.stats.failed == 0
+    assert StreetViewManifest(folder).load()[1]["status"] == "done"
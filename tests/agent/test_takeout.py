@@ -0,0 +1,106 @@
+import io
+import json
+import queue
+import tarfile
+import threading
+import zipfile
+
+from agent.takeout import PhotoFile, TakeoutLoader, _Pairer
+
+BASE = "Takeout/Google Photos/"
+
+
+def sidecar(title):
+    return json.dumps({
+        "title": title,
+        "photoTakenTime": {"timestamp": "1600000000"},
+        "url": f"https://photos.google.com/photo/ID_{title}",
+    }).encode()
+
+
+def test_load_pairs_media_across_parts(tmp_path):
+    with zipfile.ZipFile(tmp_path / "takeout-001.zip", "w") as zf:
+        zf.writestr(BASE + "Alpha/metadata.json", json.dumps({"title": "Alpha"}))
+        zf.writestr(BASE + "Alpha/IMG_1.JPG", b"1" * 100)
+        zf.writestr(BASE + "Alpha/IMG_1.JPG.json", sidecar("IMG_1.JPG"))
+        zf.writestr(BASE + "Alpha/IMG_2(1).JPG", b"2" * 100)
+        zf.writestr(BASE + "Alpha/IMG_2.JPG(1).json", sidecar("IMG_2(1).JPG"))
+        zf.writestr(BASE + "Alpha/IMG_6(1).JPG", b"6" * 100)
+        zf.writestr(BASE + "Alpha/IMG_6.JPG.supplemental-metadata(1).json",
+                    sidecar("IMG_6(1).JPG"))
+        zf.writestr(BASE + "Alpha/VID_3.mp4", b"3" * 100)
+        zf.writestr(BASE + "archive_browser.html", b"<html>")
+
+    members = [
+        # Sidecar of a video stored in the other part
+        (BASE + "Alpha/VID_3.mp4.supplemental-metadata.json", sidecar("VID_3.mp4")),
+        (BASE + "Photos from 2020/IMG_4.jpg", b"4"),
+        (BASE + "Photos from 2020/IMG_4.jpg.suppl.json", sidecar("IMG_4.jpg")),
+        (BASE + "Photos from 2020/IMG_5.jpg", b"5"),
+    ]
+    with tarfile.open(tmp_path / "takeout-002.tgz", "w:gz") as tf:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+
+    loader = TakeoutLoader(str(tmp_path / "staging"), workers=2)
+    photos = {photo.filename: photo for photo in loader.load(str(tmp_path))}
+
+    assert sorted(photos) == [
+        "IMG_1.JPG", "IMG_2(1).JPG", "IMG_4.jpg", "IMG_5.jpg", "IMG_6(1).JPG", "VID_3.mp4"
+    ]
+    assert not photos["IMG_5.jpg"].metadata
+    assert photos["IMG_5.jpg"].need_exif
+    for name in ("IMG_1.JPG", "IMG_2(1).JPG", "IMG_4.jpg", "IMG_6(1).JPG", "VID_3.mp4"):
+        model = photos[name].to_mediaitem()
+        assert model.id == f"ID_{name}"
+        assert model.mediaMetadata.createTime == "2020-09-13T12:26:40Z"
+    with open(photos["VID_3.mp4"].filepath, "rb") as f:
+        assert f.read() == b"3" * 100
+    assert loader.albums[BASE + "Alpha"] == {"title": "Alpha"}
+
+
+def test_sidecar_key():
+    assert _Pairer.sidecar_key("A/IMG.JPG.json") == "A/IMG.JPG"
+    assert _Pairer.sidecar_key("A/IMG.JPG(1).json") == "A/IMG(1).JPG"
+    assert _Pairer.sidecar_key("A/IMG.JPG.suppl.json") == "A/IMG.JPG"
+    assert _Pairer.sidecar_key("A/IMG.JPG.supplemental-metadata(1).json") == "A/IMG(1).JPG"
+    assert _Pairer.sidecar_key("A/IMG.JPG.supplemental-me(2).json") == "A/IMG(2).JPG"
+
+
+def test_load_stops_when_consumer_breaks(tmp_path):
+    with zipfile.ZipFile(tmp_path / "takeout.zip", "w") as zf:
+        for i in range(20):
+            zf.writestr(BASE + f"Alpha/IMG_{i}.JPG", b"x" * 100)
+            zf.writestr(BASE + f"Alpha/IMG_{i}.JPG.json", sidecar(f"IMG_{i}.JPG"))
+
+    staging = tmp_path / "staging"
+    loader = TakeoutLoader(str(staging), workers=1, max_pending=2)
+    first = []
+
+    def consume():
+        photos = loader.load(str(tmp_path / "takeout.zip"))
+        for photo in photos:
+            first.append(photo)
+            break
+        photos.close()
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    # Only the yielded file is left, owned by the consumer
+    assert [str(path) for path in staging.iterdir()] == [first[0].filepath]
+
+
+def test_pairer_bounds_unpaired_media():
+    output = queue.Queue()
+    pairer = _Pairer(output, threading.Event(), max_unpaired=1)
+    pairer.add_media(PhotoFile(filename="IMG_1.JPG"), "A/IMG_1.JPG")
+    assert output.empty()
+    # The oldest media goes on without its sidecar
+    pairer.add_media(PhotoFile(filename="IMG_2.JPG"), "A/IMG_2.JPG")
+    assert output.get_nowait().filename == "IMG_1.JPG"
+    pairer.add_sidecar("A/IMG_2.JPG.json", {"title": "IMG_2.JPG"})
+    assert output.get_nowait().metadata == {"title": "IMG_2.JPG"}
@@ -0,0 +1,290 @@
+import json
+import os
+import types
+
+import pytest
+
+import src.backup
+import src.batch
+from src.agent.models import AlbumModel, MediaItemModel
+from src.backup import BackupManager
+
+
+@pytest.fixture
+def staging(tmp_path):
+    folder = tmp_path / "staging"
+    folder.mkdir()
+    return folder
+
+
+def make_photos(staging, prefix, count, content=None):
+    photo_list = []
+    for i in range(count):
+        src = staging / f"{prefix}{i}.jpg"
+        src.write_bytes(content or os.urandom(64))
+        model = MediaItemModel.parse_obj({"id": f"{prefix}{i}", "filename": f"{prefix}{i}.jpg"})
+        photo_list.append((model, str(src)))
+    return photo_list
+
+
+def album_sizes(manager):
+    return {album.title: len(album.photo_by_id) for album in manager.albums_by_id.values()}
+
+
+@pytest.mark.parametrize("link_backend", ["symlink", "manifest"])
+@pytest.mark.parametrize("use_index", [True, False])
+def test_backup_and_reload(tmp_path, staging, link_backend, use_index):
+    root = tmp_path / "backup"
+    manager = BackupManager(str(root), use_index=use_index, link_backend=link_backend)
+    manager.backup_album(AlbumModel.parse_obj({"id": "a", "title": "Alpha"}),
+                         make_photos(staging, "a", 5))
+    manager.backup_album(AlbumModel.parse_obj({"id": "b", "title": "Beta"}),
+                         make_photos(staging, "b", 3) + make_photos(staging, "a", 2))
+    manager.close()
+
+    manager = BackupManager(str(root), use_index=use_index, link_backend=link_backend)
+    assert album_sizes(manager) == {"Alpha": 5, "Beta": 5}
+    assert len(manager.photo_by_id) == 8
+    assert manager.photo_by_id["a1"].metadata["filename"] == "a1.jpg"
+    manager.close()
+
+
+def test_index_reconciles_changed_folders(tmp_path, staging):
+    root = tmp_path / "backup"
+    manager = BackupManager(str(root))
+    manager.backup_album(AlbumModel.parse_obj({"id": "a", "title": "Alpha"}),
+                         make_photos(staging, "a", 3))
+    manager.backup_album(AlbumModel.parse_obj({"id": "b", "title": "Beta"}),
+                         make_photos(staging, "b", 3))
+    manager.close()
+
+    # Remove an album and a photo behind the index
+    for name in os.listdir(root / "Beta"):
+        os.remove(root / "Beta" / name)
+    os.rmdir(root / "Beta")
+    for name in ("b0.jpg", "b0.json"):
+        os.remove(root / "0_all" / name)
+
+    manager = BackupManager(str(root))
+    assert album_sizes(manager) == {"Alpha": 3}
+    assert sorted(manager.photo_by_id) == ["a0", "a1", "a2", "b1", "b2"]
+    manager.close()
+
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+def test_parallel_load_matches_serial(tmp_path, staging, monkeypatch, use_orjson):
+    # orjson is optional, a stand-in with the same bytes API covers its path
+    fake_orjson = types.SimpleNamespace(loads=json.loads) if use_orjson else None
+    monkeypatch.setattr(src.backup, "orjson", fake_orjson)
+
+    root = tmp_path / "backup"
+    manager = BackupManager(str(root), use_index=False)
+    manager.backup_album(AlbumModel.parse_obj({"id": "a", "title": "Alpha"}),
+                         make_photos(staging, "a", 20))
+    manager.backup_album(AlbumModel.parse_obj({"id": "b", "title": "Beta"}),
+                         make_photos(staging, "b", 10) + make_photos(staging, "a", 5))
+
+    def snapshot(manager):
+        albums = {album.id: list(album.photo_by_id) for album in manager.albums_by_id.values()}
+        photos = {id: photo.metadata for id, photo in manager.photo_by_id.items()}
+        return albums, photos
+
+    serial = snapshot(BackupManager(str(root), use_index=False))
+    parallel = snapshot(BackupManager(str(root), use_index=False, workers=4))
+    assert parallel == serial
+    assert len(serial[1]) == 30
+
+
+def test_dedup_stores_identical_content_once(tmp_path, staging):
+    root = tmp_path / "backup"
+    manager = BackupManager(str(root), dedup=True)
+    manager.backup_album(AlbumModel.parse_obj({"id": "a", "title": "Alpha"}),
+                         make_photos(staging, "a", 4, content=b"same"))
+    assert len(manager.photo_by_id) == 4
+    assert len(manager.photo_by_hash) == 1
+    manager.close()
+
+    manager = BackupManager(str(root), dedup=True)
+    assert len(manager.photo_by_hash) == 1
+    manager.close()
+
+
+def test_dedup_ignores_file_extension(tmp_path, staging):
+    photo_list = []
+    for i, filename in enumerate(["a.JPG", "b.jpeg", "c.jpg"]):
+        src = staging / filename
+        src.write_bytes(b"same")
+        photo_list.append((MediaItemModel.parse_obj({"id": f"id{i}", "filename": filename}),
+                           str(src)))
+
+    root = tmp_path / "backup"
+    manager = BackupManager(str(root), dedup=True)
+    manager.backup_album(AlbumModel.parse_obj({"id": "a", "title": "Alpha"}), photo_list)
+    manager.close()
+    blobs = [name for _, _, names in os.walk(root / ".store") for name in names]
+    assert len(blobs) == 1
+
+
+def test_rescanned_album_keeps_indexed_digest(tmp_path, staging):
+    root = tmp_path / "backup"
+    manager = BackupManager(str(root), dedup=True)
+    manager.backup_album(AlbumModel.parse_obj({"id": "a", "title": "Alpha"}),
+                         make_photos(staging, "a", 4))
+    manager.close()
+
+    # Changing the album folder makes the next load rescan it
+    os.utime(root / "Alpha", ns=(0, 0))
+    manager = BackupManager(str(root), dedup=True)
+    assert len(manager.photo_by_hash) == 4
+    assert all(photo.sha256 for photo in manager.photo_by_id.values())
+    manager.close()
+
+
+def test_batched_backup_recovers_uncommitted_photo(tmp_path, staging):
+    root = tmp_path / "backup"
+    photo_list = make_photos(staging, "a", 5)
+    # A media file placed by an interrupted run, its sidecar never committed
+    os.makedirs(root / "0_all")
+    (root / "0_all" / "a3.jpg").write_bytes(b"partial")
+
+    manager = BackupManager(str(root), link_backend="manifest", batch_size=2)
+    manager.backup_album(AlbumModel.parse_obj({"id": "a", "title": "Alpha"}), photo_list)
+    manager.close()
+
+    assert (root / "0_all" / "a3.jpg").read_bytes() == open(photo_list[3][1], "rb").read()
+    assert not [name for name in os.listdir(root / "0_all") if name.endswith(".tmp")]
+    manager = BackupManager(str(root), use_index=False, link_backend="manifest")
+    assert album_sizes(manager) == {"Alpha": 5}
+
+
+def test_batch_size_counts_photos(tmp_path, staging, monkeypatch):
+    commits = []
+    commit = src.batch.MetadataWriter.commit
+    monkeypatch.setattr(src.batch.MetadataWriter, "commit",
+                        lambda writer: commits.append(1) or commit(writer))
+
+    manager = BackupManager(str(tmp_path / "backup"), link_backend="manifest", batch_size=2)
+    manager.backup_album(AlbumModel.parse_obj({"id": "a", "title": "Alpha"}),
+                         make_photos(staging, "a", 5))
+    manager.close()
+    # After the 2nd and 4th photos, and the rest on exit
+    assert len(commits) == 3
+
+
+@pytest.mark.parametrize("filenames", [
+    ["IMG_0001.JPG", "IMG_0001.JPG"],
+    # A Live Photo, both files share the sidecar name
+    ["IMG_1234.HEIC", "IMG_1234.MOV"],
+])
+def test_batched_backup_keeps_colliding_names(tmp_path, staging, filenames):
+    photo_list = []
+    for i, filename in enumerate(filenames):
+        src = staging / f"{i}_{filename}"
+        src.write_bytes(os.urandom(64))
+        model = MediaItemModel.parse_obj({"id": f"id{i}", "filename": filename})
+        photo_list.append((model, str(src)))
+
+    root = tmp_path / "backup"
+    manager = BackupManager(str(root), link_backend="manifest")
+    manager.backup_album(AlbumModel.parse_obj({"id": "a", "title": "Alpha"}), photo_list)
+    manager.close()
+
+    manager = BackupManager(str(root), use_index=False, link_backend="manifest")
+    assert album_sizes(manager) == {"Alpha": 2}
+    for i, (model, src) in enumerate(photo_list):
+        photo = manager.photo_by_id[f"id{i}"]
+        assert photo.filename == model.filename
+        assert open(photo.filepath, "rb").read() == open(src, "rb").read()
+    manager.close()
+
+
+def test_interrupted_move_backup_retries(tmp_path, staging):
+    root = tmp_path / "backup"
+    photo_list = make_photos(staging, "p", 3)
+    contents = [open(src, "rb").read() for _, src in photo_list]
+    # The last source is missing, the batch stops after moving the first two
+    os.rename(photo_list[2][1], staging / "held")
+
+    manager = BackupManager(str(root), link_backend="manifest", placement="move")
+    album_model = AlbumModel.parse_obj({"id": "a", "title": "Alpha"})
+    with pytest.raises(FileNotFoundError):
+        manager.backup_album(album_model, photo_list)
+    assert sorted(manager.photo_by_id) == ["p0", "p1"]
+
+    os.rename(staging / "held", photo_list[2][1])
+    manager.backup_album(album_model, photo_list)
+    manager.close()
+
+    manager = BackupManager(str(root), use_index=False, link_backend="manifest")
+    assert album_sizes(manager) == {"Alpha": 3}
+    for i, content in enumerate(contents):
+        assert open(manager.photo_by_id[f"p{i}"].filepath, "rb").read() == content
+    assert not os.listdir(staging)
+    manager.close()
+
+
+def test_orphan_is_adopted_when_source_is_gone(tmp_path, staging):
+    root = tmp_path / "backup"
+    photo_list = make_photos(staging, "p", 2)
+    # Moved by a run killed before its sidecar commit
+    os.makedirs(root / "0_all")
+    os.rename(photo_list[0][1], root / "0_all" / "p0.jpg")
+
+    manager = BackupManager(str(root), link_backend="manifest", placement="move")
+    manager.backup_album(AlbumModel.parse_obj({"id": "a", "title": "Alpha"}), photo_list)
+    manager.close()
+    assert album_sizes(BackupManager(str(root), use_index=False,
+                                     link_backend="manifest")) == {"Alpha": 2}
+
+
+def test_failed_commit_is_rolled_back(tmp_path, staging, monkeypatch):
+    root = tmp_path / "backup"
+    manager = BackupManager(str(root), link_backend="manifest")
+    album_model = AlbumModel.parse_obj({"id": "a", "title": "Alpha"})
+    create_links = manager.link_backend.create_links
+
+    def fail_once(links):
+        monkeypatch.setattr(manager.link_backend, "create_links", create_links)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(manager.link_backend, "create_links", fail_once)
+    photo_list = make_photos(staging, "p", 3)
+    with pytest.raises(OSError):
+        manager.backup_album(album_model, photo_list)
+    # The sidecars made it to the disk, the album links did not
+    assert len(manager.photo_by_id) == 3
+    assert album_sizes(manager) == {"Alpha": 0}
+
+    manager.backup_album(album_model, photo_list)
+    manager.close()
+    manager = BackupManager(str(root), use_index=False, link_backend="manifest")
+    assert album_sizes(manager) == {"Alpha": 3}
+    manager.close()
+
+
+def test_unwritten_sidecars_are_forgotten(tmp_path, staging, monkeypatch):
+    root = tmp_path / "backup"
+    manager = BackupManager(str(root), link_backend="manifest")
+    album_model = AlbumModel.parse_obj({"id": "a", "title": "Alpha"})
+    manager.backup_album(album_model, [])
+    write_tmp = src.batch._write_tmp
+
+    def fail_once(*args, **kwargs):
+        monkeypatch.setattr(src.batch, "_write_tmp", write_tmp)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(src.batch, "_write_tmp", fail_once)
+    photo_list = make_photos(staging, "p", 3)
+    with pytest.raises(OSError):
+        manager.backup_album(album_model, photo_list)
+    assert manager.photo_by_id == {}
+
+    # The placed files are copies of their sources and are adopted
+    manager.backup_album(album_model, photo_list)
+    manager.close()
+    manager = BackupManager(str(root), use_index=False, link_backend="manifest")
+    assert album_sizes(manager) == {"Alpha": 3}
+    assert sorted(os.listdir(root / "0_all")) == [
+        f"p{i}.{ext}" for i in range(3) for ext in ("jpg", "json")
+    ]
+    manager.close()
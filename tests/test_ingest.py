@@ -0,0 +1,36 @@
+import json
+import zipfile
+
+from src.agent.takeout import TakeoutLoader
+from src.backup import BackupManager
+
+BASE = "Takeout/Google Photos/"
+
+
+def test_ingest_into_backup(tmp_path):
+    with zipfile.ZipFile(tmp_path / "takeout.zip", "w") as zf:
+        for year in ("2019", "2020"):
+            folder = BASE + f"Photos from {year}/"
+            zf.writestr(folder + "IMG_0001.JPG", year.encode() * 25)
+            zf.writestr(folder + "IMG_0001.JPG.json", json.dumps({
+                "title": "IMG_0001.JPG",
+                "url": f"https://photos.google.com/photo/ID_{year}",
+            }))
+
+    staging = tmp_path / "staging"
+    root = str(tmp_path / "backup")
+    manager = BackupManager(root, link_backend="manifest")
+    loader = TakeoutLoader(str(staging), workers=1)
+    assert loader.ingest(str(tmp_path / "takeout.zip"), manager, batch_size=1) == 2
+    manager.close()
+    assert not list(staging.iterdir())
+
+    manager = BackupManager(root, use_index=False, link_backend="manifest")
+    albums = {album.title: list(album.photo_by_id) for album in manager.albums_by_id.values()}
+    assert albums == {"Photos from 2019": ["ID_2019"], "Photos from 2020": ["ID_2020"]}
+    for year in ("2019", "2020"):
+        photo = manager.photo_by_id[f"ID_{year}"]
+        assert photo.filename == "IMG_0001.JPG"
+        with open(photo.filepath, "rb") as f:
+            assert f.read() == year.encode() * 25
+    manager.close()
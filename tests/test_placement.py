@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from src.placement import place_file
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / "src.jpg"
+    path.write_bytes(os.urandom(1 << 16))
+    return path
+
+
+@pytest.mark.parametrize("strategy", ["copy", "hardlink", "reflink", "auto"])
+def test_place_keeps_source(src, tmp_path, strategy):
+    dst = tmp_path / "dst.jpg"
+    used = place_file(str(src), str(dst), strategy)
+    assert used in ("copy", "hardlink", "reflink")
+    assert dst.read_bytes() == src.read_bytes()
+    assert src.exists()
+
+
+def test_move(src, tmp_path):
+    data = src.read_bytes()
+    dst = tmp_path / "dst.jpg"
+    assert place_file(str(src), str(dst), "move") == "move"
+    assert dst.read_bytes() == data
+    assert not src.exists()
+
+
+def test_hardlink_shares_inode(src, tmp_path):
+    dst = tmp_path / "dst.jpg"
+    if place_file(str(src), str(dst), "hardlink") == "hardlink":
+        assert os.stat(dst).st_ino == os.stat(src).st_ino
+
+
+def test_unknown_strategy(src, tmp_path):
+    with pytest.raises(ValueError):
+        place_file(str(src), str(tmp_path / "dst.jpg"), "teleport")
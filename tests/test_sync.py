@@ -0,0 +1,62 @@
+import os
+
+from src.agent.models import AlbumModel, MediaItemModel
+from src.backup import BackupManager
+from src.sync import AlbumSync
+
+
+class FakePhotoClient:
+    def __init__(self):
+        self.listed = []
+        self.albums = [{"id": "a", "title": "Alpha", "mediaItemsCount": "3",
+                        "coverPhotoMediaItemId": "a0"}]
+        self.items = {"a": [{"id": f"a{i}", "filename": f"a{i}.jpg"} for i in range(3)]}
+
+    def iter_all_albums(self):
+        return (AlbumModel.parse_obj(album) for album in self.albums)
+
+    def iter_photo_in_albums(self, album):
+        self.listed.append(album.id)
+        return (MediaItemModel.parse_obj(item) for item in self.items[album.id])
+
+
+class FakeDownloader:
+    def __init__(self, folder):
+        self.folder = folder
+        self.downloaded = []
+
+    def download(self, items):
+        photo_list = []
+        for model in items:
+            path = os.path.join(self.folder, model.filename)
+            with open(path, "wb") as f:
+                f.write(model.id.encode())
+            self.downloaded.append(model.id)
+            photo_list.append((model, path))
+        return photo_list
+
+
+def test_sync_only_fetches_deltas(tmp_path):
+    root = str(tmp_path / "backup")
+    client = FakePhotoClient()
+    downloader = FakeDownloader(str(tmp_path))
+
+    manager = BackupManager(root)
+    AlbumSync(client, manager, downloader).sync()
+    assert client.listed == ["a"]
+    assert downloader.downloaded == ["a0", "a1", "a2"]
+
+    # Nothing changed, the album is not listed again
+    stats = AlbumSync(client, manager, downloader).sync()
+    assert stats.changed_albums == 0
+    assert client.listed == ["a"]
+    manager.close()
+
+    client.albums[0]["mediaItemsCount"] = "4"
+    client.items["a"].append({"id": "a3", "filename": "a3.jpg"})
+    manager = BackupManager(root)
+    AlbumSync(client, manager, downloader).sync()
+    assert client.listed == ["a", "a"]
+    assert downloader.downloaded == ["a0", "a1", "a2", "a3"]
+    assert len(manager.albums_by_id["a"].photo_by_id) == 4
+    manager.close()